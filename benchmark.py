@@ -0,0 +1,204 @@
+import argparse
+import json
+import multiprocessing
+import platform
+import random
+import string
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pdf_generator
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Default benchmark matrix
+DEFAULT_SIZES = [10, 100, 1000, 10000, 100000]
+DEFAULT_BARCODE_LENGTHS = [8, 16]
+
+# Relative labels/sec drop that counts as a regression when comparing runs
+DEFAULT_THRESHOLD = 0.10
+
+class CountingSink:
+    """Binary file stand-in that only counts bytes, so disk speed does not skew results."""
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+        return len(data)
+
+def peak_rss_kb():
+    """Peak resident set size of this process in KiB, or None where unsupported."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak  # macOS reports bytes
+
+def make_items(count, barcode_length, distinct=1.0, seed=0):
+    """Build a deterministic synthetic batch; distinct < 1 repeats values like reprints do."""
+    rng = random.Random(seed)
+    alphabet = string.ascii_uppercase + string.digits + '-'
+    pool_size = max(1, int(count * distinct))
+    pool = [{
+        'title1': f"PART {rng.randrange(10**6):06d}",
+        'title2': f"Aisle {rng.randrange(40)} Bin {rng.choice(string.ascii_uppercase)}{rng.randrange(100)}",
+        'barcode': ''.join(rng.choice(alphabet) for _ in range(barcode_length)),
+    } for _ in range(pool_size)]
+    return [pool[i % pool_size] for i in range(count)]
+
+def clear_caches():
+    pdf_generator.BARCODE_CACHE.clear()
+    pdf_generator.LABEL_CACHE.clear()
+
+def run_case(count, barcode_length, distinct, options):
+    """Benchmark one batch size; meant to run in a fresh process so peak RSS is per case."""
+    items = make_items(count, barcode_length, distinct)
+    rss_before = peak_rss_kb()
+
+    # Full run, as create_pdf/write_pdf callers see it, with the engine's own phase timings:
+    # barcode encoding and text layout are timed on cache misses, apart from the rest of rendering
+    clear_caches()
+    sink = CountingSink()
+    stats = pdf_generator.RenderStats()
+    start = time.perf_counter()
+    pdf_generator.write_pdf(items, sink, stats=stats, **options)
+    total = time.perf_counter() - start
+    rss_peak = peak_rss_kb()
+
+    return {
+        'labels': count,
+        'barcode_length': barcode_length,
+        'seconds': total,
+        'labels_per_sec': count / total if total else None,
+        'bytes': sink.size,
+        'bytes_per_label': sink.size / count,
+        'rss_before_kb': rss_before,
+        'peak_rss_kb': rss_peak,
+        'phases': dict(stats.phases),
+        'cache': stats.as_dict()['cache'],
+    }
+
+def phase_line(phases):
+    """Per-phase seconds for the progress line: input, encode, layout, render, and serialize (write plus xref)."""
+    shown = {name: phases.get(name, 0.0) for name in ('input', 'encode', 'layout', 'render')}
+    shown['serialize'] = phases.get('write', 0.0) + phases.get('xref', 0.0)
+    return ', '.join(f"{name} {seconds:.3f}s" for name, seconds in shown.items())
+
+def run_suite(sizes, barcode_lengths, distinct, options, in_process=False):
+    cases = []
+    for barcode_length in barcode_lengths:
+        for count in sizes:
+            if in_process:
+                result = run_case(count, barcode_length, distinct, options)
+            else:
+                context = multiprocessing.get_context('spawn')
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    result = executor.submit(run_case, count, barcode_length, distinct, options).result()
+            cases.append(result)
+            print(f"{count:>7} labels, {barcode_length:>2}-char barcodes: "
+                  f"{result['labels_per_sec']:>9.0f} labels/s, "
+                  f"{result['bytes_per_label']:>7.0f} B/label, "
+                  f"peak RSS {result['peak_rss_kb']} KiB, "
+                  f"{phase_line(result['phases'])}", file=sys.stderr)
+    return cases
+
+def comparable(results, baseline):
+    """Return why two runs cannot be compared (different options or distinct fraction), or None."""
+    for key in ('options', 'distinct'):
+        if results.get(key) != baseline.get(key):
+            return f"{key} differ: {baseline.get(key)} in the baseline, {results.get(key)} now"
+    return None
+
+def compare(results, baseline, threshold):
+    """Return messages for cases whose labels/sec fell more than threshold below the baseline."""
+    previous = {(case['labels'], case['barcode_length']): case for case in baseline['cases']}
+    regressions = []
+    for case in results['cases']:
+        old = previous.get((case['labels'], case['barcode_length']))
+        if not old or not old['labels_per_sec'] or not case['labels_per_sec']:
+            continue
+        change = case['labels_per_sec'] / old['labels_per_sec'] - 1
+        if change < -threshold:
+            regressions.append(f"{case['labels']} labels, {case['barcode_length']}-char barcodes: "
+                               f"{old['labels_per_sec']:.0f} -> {case['labels_per_sec']:.0f} labels/s "
+                               f"({change:+.1%})")
+    return regressions
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the PDF and barcode engine without the GUI.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="batch sizes in labels (default: %(default)s)")
+    parser.add_argument('--barcode-lengths', type=int, nargs='+', default=DEFAULT_BARCODE_LENGTHS,
+                        help="barcode lengths in characters (default: %(default)s)")
+    parser.add_argument('--distinct', type=float, default=1.0,
+                        help="fraction of distinct labels in each batch (default: 1.0)")
+    parser.add_argument('--compress', type=int, metavar='LEVEL', choices=range(10),
+                        help="Flate-compress page content at zlib LEVEL 0-9")
+    parser.add_argument('--xobjects', action='store_true', help="use Form XObject mode")
+    parser.add_argument('--template', choices=sorted(pdf_generator.TEMPLATES),
+                        help="sheet template (default: letter-4)")
+    parser.add_argument('--fit-text', action='store_true', help="shrink or truncate titles to fit")
+    parser.add_argument('--symbology', choices=pdf_generator.SYMBOLOGIES, default=pdf_generator.SYMBOLOGY_CODE39,
+                        help="barcode symbology (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=1, help="render pages in this many processes")
+    parser.add_argument('--in-process', action='store_true',
+                        help="run every case in this process (peak RSS then covers all cases so far)")
+    parser.add_argument('-o', '--output', help="save results as JSON to this file")
+    parser.add_argument('--compare', metavar='BASELINE', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="labels/sec drop that counts as a regression (default: %(default)s)")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    options = {
+        'compress_level': args.compress,
+        'use_xobjects': args.xobjects,
+        'workers': args.workers,
+        'template': args.template,
+        'fit_text': args.fit_text,
+        'symbology': args.symbology,
+    }
+    if not 0 < args.distinct <= 1:
+        print("Error: --distinct must be in (0, 1]", file=sys.stderr)
+        return 2
+
+    # Only runs with the same settings are comparable; check before spending time on the suite
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        mismatch = comparable({'options': options, 'distinct': args.distinct}, baseline)
+        if mismatch:
+            print(f"Error: cannot compare against {args.compare}, {mismatch}", file=sys.stderr)
+            return 2
+
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'distinct': args.distinct,
+        'options': options,
+        'cases': run_suite(args.sizes, args.barcode_lengths, args.distinct, options, args.in_process),
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        for message in regressions:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        if regressions:
+            return 1
+        print("No regressions against baseline", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
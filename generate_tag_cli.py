@@ -0,0 +1,158 @@
+import argparse
+import os
+import sys
+from itertools import chain, islice
+from typing import Optional
+
+import item_reader
+import pdf_generator
+import printer_language
+
+def shard_path(output: str, index: int, extension: str = '.pdf') -> str:
+    """Number an output path for one shard: labels.pdf -> labels-0001.pdf, labels -> labels-0001{extension}."""
+    base, ext = os.path.splitext(output)
+    return f"{base}-{index:04d}{ext or extension}"
+
+def output_extension(printer: Optional[str]) -> str:
+    """File extension for the output: .pdf, or .zpl/.epl for a printer language."""
+    return f'.{printer}' if printer else '.pdf'
+
+def write_file(path: str, items, options: dict, writer=pdf_generator.write_pdf) -> int:
+    """Write one output file through a temporary file so a failed run never leaves a partial file."""
+    temp_path = path + '.part'
+    try:
+        with open(temp_path, 'wb') as f:
+            count = writer(items, f, **options)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return count
+
+def generate(items, output: str, shard_size: int, options: dict, writer=pdf_generator.write_pdf,
+             extension: str = '.pdf') -> list:
+    """Write all items to one file, or to numbered files of shard_size labels; returns (path, count) pairs.
+
+    writer is pdf_generator.write_pdf or printer_language.write_labels, called with options;
+    extension names shards of an output path that has none.
+    If any shard fails, the shards already written by this run are removed as well.
+    """
+    if output == '-':
+        if shard_size:
+            raise ValueError("Sharding needs an output file name, not stdout")
+        return [('-', writer(items, sys.stdout.buffer, **options))]
+    if not shard_size:
+        return [(output, write_file(output, items, options, writer))]
+
+    written = []
+    items = iter(items)
+    try:
+        for first in items:
+            path = shard_path(output, len(written) + 1, extension)
+            shard = chain([first], islice(items, shard_size - 1))
+            written.append((path, write_file(path, shard, options, writer)))
+    except BaseException:
+        for path, _ in written:
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    if not written:
+        raise ValueError("No items provided for PDF generation")
+    return written
+
+def append_file(path: str, items, options: dict) -> list:
+    """Add items to an existing label PDF as an incremental update; returns one (path, count) pair."""
+    with open(path, 'r+b') as f:
+        return [(path, pdf_generator.append_pdf(items, f, **options))]
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Generate barcode label PDFs from CSV or JSON Lines without the GUI.")
+    parser.add_argument('input', nargs='?', default='-',
+                        help="CSV or JSONL file to read, or - for stdin (default)")
+    parser.add_argument('-o', '--output',
+                        help="file to write, or - for stdout (default: labels.pdf, or labels.zpl/labels.epl "
+                             "with --printer)")
+    parser.add_argument('-f', '--format', choices=[item_reader.FORMAT_CSV, item_reader.FORMAT_JSONL],
+                        help="input format (default: from the file extension, else csv)")
+    parser.add_argument('-m', '--map', action='append', default=[], metavar='FIELD=COLUMN',
+                        help="read a label field from another column, e.g. barcode=PartNo (repeatable)")
+    parser.add_argument('--encoding', default='utf-8-sig', help="input text encoding (default: utf-8-sig)")
+    parser.add_argument('--shard-size', type=int, default=0, metavar='N',
+                        help="split the output into numbered PDFs of N labels each; "
+                             "a failed run removes the shards it wrote")
+    parser.add_argument('-a', '--append', action='store_true',
+                        help="add the labels to the existing output PDF instead of replacing it")
+    parser.add_argument('-t', '--template', choices=sorted(pdf_generator.TEMPLATES),
+                        help="sheet template to lay labels out on (default: letter-4)")
+    parser.add_argument('--fit-text', action='store_true',
+                        help="shrink, then truncate, titles that are wider than the label")
+    parser.add_argument('-b', '--symbology', choices=pdf_generator.SYMBOLOGIES,
+                        default=pdf_generator.SYMBOLOGY_CODE39,
+                        help="barcode symbology for items without a symbology column (default: %(default)s)")
+    parser.add_argument('--compress', type=int, metavar='LEVEL', choices=range(10),
+                        help="Flate-compress page content at zlib LEVEL 0-9")
+    parser.add_argument('--xobjects', action='store_true',
+                        help="define the label frame and barcode glyphs once as Form XObjects")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="render pages in this many processes (default: 1)")
+    parser.add_argument('--stats', action='store_true',
+                        help="report phase timings, counts and cache hit rates on stderr")
+    parser.add_argument('--printer', choices=list(printer_language.RENDERERS),
+                        help="write a ZPL or EPL print job instead of a PDF (sheet and PDF options are ignored)")
+    parser.add_argument('--dpi', type=int, default=printer_language.DEFAULT_DPI,
+                        help="printer resolution for --printer (default: %(default)s)")
+    return parser
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    stats = None
+    if args.printer:
+        writer = printer_language.write_labels
+        options = {'language': args.printer, 'dpi': args.dpi, 'fit_text': args.fit_text,
+                   'symbology': args.symbology}
+    else:
+        writer = pdf_generator.write_pdf
+        options = {
+            'compress_level': args.compress,
+            'use_xobjects': args.xobjects,
+            'workers': args.workers,
+            'template': args.template,
+            'fit_text': args.fit_text,
+            'symbology': args.symbology,
+        }
+        if args.stats:
+            stats = options['stats'] = pdf_generator.RenderStats()
+
+    try:
+        if args.shard_size < 0:
+            raise ValueError("Shard size must be a positive number of labels")
+        extension = output_extension(args.printer)
+        output = args.output or 'labels' + extension
+        if args.append and (args.printer or args.shard_size or output == '-'):
+            raise ValueError("Appending needs an existing PDF output file, without --printer or --shard-size")
+        mapping = item_reader.parse_mapping(args.map)
+        fmt = args.format or item_reader.guess_format(args.input)
+        if args.input == '-':
+            source = open(sys.stdin.fileno(), 'r', encoding=args.encoding, newline='', closefd=False)
+        else:
+            source = open(args.input, 'r', encoding=args.encoding, newline='')
+        with source:
+            items = item_reader.read_items(source, fmt, mapping)
+            if args.append:
+                written = append_file(output, items, options)
+            else:
+                written = generate(items, output, args.shard_size, options, writer, extension)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    for path, count in written:
+        print(f"{path}: {count} labels", file=sys.stderr)
+    if stats is not None:
+        print(f"Stats: {stats.summary()}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,11 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
+from tkinter import ttk, messagebox, filedialog, font as tkfont
 import os
 import sys
 import json
+import queue
+import threading
+import time
 
 def resource_path(relative_path):
     """Get absolute path to resource, works for dev and for PyInstaller"""
@@ -13,41 +16,70 @@ def resource_path(relative_path):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, relative_path)
 
-# Import pdf_generator with path handling
+# Import bundled modules with path handling
 import importlib.util
-spec = importlib.util.spec_from_file_location(
-    "pdf_generator",
-    resource_path("pdf_generator.py")
-)
-pdf_generator = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(pdf_generator)
+
+def load_module(name):
+    """Load a module that ships next to this script (or inside the PyInstaller bundle)"""
+    spec = importlib.util.spec_from_file_location(name, resource_path(f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+pdf_generator = load_module("pdf_generator")
+item_reader = load_module("item_reader")
+
+# Editable columns of the label grid
+COLUMNS = [("title1", "Title 1"), ("title2", "Title 2"), ("barcode", "Barcode")]
+
+# How often the UI checks on a running generation (milliseconds)
+POLL_INTERVAL = 100
+
+# Label preview: canvas pixels per PDF point, and the pause after an edit before redrawing (milliseconds)
+PREVIEW_SCALE = 1.25
+PREVIEW_DELAY = 150
+
+# Run statistics are appended to the stats log only when the config file sets "log_stats": true;
+# past this size the log is moved aside to a .1 file and a new one started
+STATS_LOG_MAX_BYTES = 1024 * 1024
+
+class GenerationCancelled(Exception):
+    """Raised inside the worker thread when the user presses Cancel"""
 
 class LabelGeneratorApp:
     def __init__(self, master):
         self.master = master
         master.title("Barcode Label Generator")
-        master.geometry("600x600")
+        master.geometry("600x820")
         
         # Try to load last save directory
         self.config_file = os.path.join(os.path.expanduser("~"), ".label_generator_config")
+        self.stats_log = os.path.join(os.path.expanduser("~"), ".label_generator_stats.log")
         self.last_directory = self.load_last_directory()
+        self.log_stats_enabled = self.load_config().get('log_stats') is True
         
         self.create_widgets()
 
-    def load_last_directory(self):
+    def load_config(self):
         try:
             if os.path.exists(self.config_file):
                 with open(self.config_file, 'r') as f:
                     config = json.load(f)
-                    return config.get('last_directory', os.path.expanduser("~"))
+                    if isinstance(config, dict):
+                        return config
         except Exception:
             pass
-        return os.path.expanduser("~")
+        return {}
+
+    def load_last_directory(self):
+        return self.load_config().get('last_directory', os.path.expanduser("~"))
 
     def save_last_directory(self, directory):
+        config = self.load_config()  # Keep other settings, such as log_stats
+        config['last_directory'] = directory
         try:
             with open(self.config_file, 'w') as f:
-                json.dump({'last_directory': directory}, f)
+                json.dump(config, f)
         except Exception:
             pass
 
@@ -74,39 +106,83 @@ class LabelGeneratorApp:
                   text="Generate Input Fields",
                   command=self.generate_input_fields).pack(side="left", padx=5, pady=5)
 
-        # Create container frame for canvas and scrollbar
-        self.container = ttk.LabelFrame(self.main_frame, text="Label Details")
-        self.container.pack(fill="both", expand=True, padx=5, pady=5)
-        
-        # Create canvas
-        self.canvas = tk.Canvas(self.container)
-        
-        # Create scrollbar
-        self.scrollbar = ttk.Scrollbar(self.container, orient="vertical", command=self.canvas.yview)
-        
-        # Create frame inside canvas
-        self.scrollable_frame = ttk.Frame(self.canvas)
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
-        )
+        ttk.Button(input_frame,
+                  text="Import...",
+                  command=self.import_items).pack(side="right", padx=5, pady=5)
 
-        # Place the frame in the canvas
-        self.canvas_frame = self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
+        # Label grid: one Treeview row per label, edited in place
+        self.container = ttk.LabelFrame(self.main_frame,
+                                        text="Label Details (double-click to edit, Ctrl+V pastes spreadsheet rows)")
+        self.container.pack(fill="both", expand=True, padx=5, pady=5)
 
-        # Configure canvas and scrollbar
-        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+        self.tree = ttk.Treeview(self.container, columns=[key for key, _ in COLUMNS], selectmode="extended")
+        self.tree.heading("#0", text="Label")
+        self.tree.column("#0", width=60, stretch=False)
+        for key, heading in COLUMNS:
+            self.tree.heading(key, text=heading)
+            self.tree.column(key, width=150)
 
-        # Pack canvas and scrollbar
-        self.canvas.pack(side="left", fill="both", expand=True)
+        self.scrollbar = ttk.Scrollbar(self.container, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self.scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
         self.scrollbar.pack(side="right", fill="y")
 
-        # Bind canvas resizing
-        self.canvas.bind('<Configure>', self.on_canvas_configure)
-
-        # Mouse wheel scrolling
-        self.scrollable_frame.bind('<Enter>', self._bound_to_mousewheel)
-        self.scrollable_frame.bind('<Leave>', self._unbound_to_mousewheel)
+        self.tree.bind("<Double-1>", self.on_tree_double_click)
+        self.tree.bind("<Return>", lambda e: self.edit_selected())
+        self.tree.bind("<Delete>", lambda e: self.delete_selected())
+        self.tree.bind("<<Paste>>", lambda e: self.paste_rows())
+
+        # Single editor widget, moved over whichever cell is being edited
+        self.editor = ttk.Entry(self.tree)
+        self.editor.bind("<Return>", lambda e: self.finish_edit())
+        self.editor.bind("<KP_Enter>", lambda e: self.finish_edit())
+        self.editor.bind("<Tab>", lambda e: self.finish_edit(step=1))
+        self.editor.bind("<Shift-Tab>", lambda e: self.finish_edit(step=-1))
+        self.editor.bind("<Escape>", lambda e: self.cancel_edit())
+        self.editor.bind("<FocusOut>", lambda e: self.master.after_idle(self.editor_focus_lost))
+        self.editor.bind("<KeyRelease>", self.schedule_preview)
+        self.editing = None  # (row index, column index) under the editor
+        self.tree.bind("<<TreeviewSelect>>", self.schedule_preview)
+
+        # Preview of the selected label, drawn from the geometry the PDF uses
+        preview_frame = ttk.LabelFrame(self.main_frame, text="Preview")
+        preview_frame.pack(fill="x", padx=5, pady=5)
+        self.preview = tk.Canvas(preview_frame,
+                                 width=round(pdf_generator.LABEL_WIDTH * PREVIEW_SCALE),
+                                 height=round(pdf_generator.LABEL_HEIGHT * PREVIEW_SCALE),
+                                 background="white",
+                                 highlightthickness=0)
+        self.preview.pack(pady=5)
+        self.preview_note = ttk.Label(preview_frame, text="", foreground="red")
+        self.preview_note.pack(pady=(0, 5))
+        self.preview_job = None  # Pending after() call for a debounced redraw
+        self.preview_cache = {}  # Row index -> (geometry key, geometry)
+        self.preview_key = None  # Geometry key of the label on the canvas
+        self.preview_fonts = {}  # (font name, size) -> Tk font
+
+        # Label data lives here; the Treeview only mirrors it
+        self.items = []
+
+        # Progress of a running generation
+        progress_frame = ttk.Frame(self.main_frame)
+        progress_frame.pack(fill="x", padx=5, pady=(5, 0))
+
+        self.progress = ttk.Progressbar(progress_frame, mode="determinate")
+        self.progress.pack(side="left", fill="x", expand=True, padx=5)
+
+        self.status_label = ttk.Label(progress_frame, text="", width=24)
+        self.status_label.pack(side="left", padx=5)
+
+        self.cancel_button = ttk.Button(progress_frame,
+                                      text="Cancel",
+                                      state="disabled",
+                                      command=self.cancel_generation)
+        self.cancel_button.pack(side="right", padx=5)
+
+        # Generation runs in a worker thread and reports back through this queue
+        self.events = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.worker = None
 
         # Button frame
         button_frame = ttk.Frame(self.main_frame)
@@ -118,24 +194,52 @@ class LabelGeneratorApp:
                                         command=self.generate_labels)
         self.generate_button.pack(side="right", padx=5)
 
-    def on_canvas_configure(self, event):
-        # Update the width of the canvas window to fit the frame
-        self.canvas.itemconfig(self.canvas_frame, width=event.width)
-
-    def _bound_to_mousewheel(self, event):
-        self.canvas.bind_all("<MouseWheel>", self._on_mousewheel)
-
-    def _unbound_to_mousewheel(self, event):
-        self.canvas.unbind_all("<MouseWheel>")
-
-    def _on_mousewheel(self, event):
-        self.canvas.yview_scroll(int(-1*(event.delta/120)), "units")
+        # Sheet template the labels are laid out on
+        ttk.Label(button_frame, text="Sheet:").pack(side="left", padx=5)
+        self.template_choice = ttk.Combobox(button_frame,
+                                            values=list(pdf_generator.TEMPLATES),
+                                            state="readonly",
+                                            width=14)
+        self.template_choice.set(pdf_generator.DEFAULT_TEMPLATE.name)
+        self.template_choice.pack(side="left")
+        self.template_choice.bind("<<ComboboxSelected>>", self.template_selected)
+
+        # Barcode symbology used for every label
+        ttk.Label(button_frame, text="Barcode:").pack(side="left", padx=5)
+        self.symbology_choice = ttk.Combobox(button_frame,
+                                             values=list(pdf_generator.SYMBOLOGIES),
+                                             state="readonly",
+                                             width=9)
+        self.symbology_choice.set(pdf_generator.SYMBOLOGY_CODE39)
+        self.symbology_choice.pack(side="left")
+        self.symbology_choice.bind("<<ComboboxSelected>>", self.schedule_preview)
+
+        # Shrink or truncate titles that are too wide for the label; off by default, like the CLI and engine
+        self.fit_text = tk.BooleanVar(value=False)
+        ttk.Checkbutton(button_frame,
+                       text="Fit titles",
+                       variable=self.fit_text,
+                       command=self.schedule_preview).pack(side="left", padx=10)
+
+    def template_selected(self, event=None):
+        """Warn when the chosen sheet shrinks barcodes too far for reliable scanning"""
+        warning = pdf_generator.template_warning(self.template_choice.get())
+        if warning:
+            messagebox.showwarning("Small Labels", warning)
+
+    def refresh_tree(self):
+        """Rebuild the grid rows from the item list"""
+        self.cancel_edit()
+        self.tree.delete(*self.tree.get_children())
+        for i, item in enumerate(self.items):
+            self.tree.insert("", "end", iid=str(i), text=str(i + 1),
+                             values=[item[key] for key, _ in COLUMNS])
+        self.num_items.delete(0, "end")
+        self.num_items.insert(0, str(len(self.items)))
+        self.preview_cache.clear()  # Row indexes may now point at other labels
+        self.schedule_preview()
 
     def generate_input_fields(self):
-        # Clear previous inputs
-        for widget in self.scrollable_frame.winfo_children():
-            widget.destroy()
-
         try:
             num_items = int(self.num_items.get())
             if num_items < 1:
@@ -145,101 +249,361 @@ class LabelGeneratorApp:
                                "Please enter a valid number of items (positive integer).")
             return
 
-        self.item_inputs = []
-        for i in range(num_items):
-            frame = ttk.LabelFrame(self.scrollable_frame, text=f"Label {i+1}")
-            frame.pack(pady=5, padx=10, fill="x")
-
-            # Grid layout for better alignment
-            frame.grid_columnconfigure(1, weight=1)
+        # Keep rows already filled in, add blank ones or drop the extra ones
+        del self.items[num_items:]
+        self.items.extend({key: "" for key, _ in COLUMNS} for _ in range(num_items - len(self.items)))
+        self.refresh_tree()
 
-            # Title 1
-            ttk.Label(frame, text="Title 1:").grid(row=0, column=0, padx=5, pady=2, sticky="e")
-            title1 = ttk.Entry(frame)
-            title1.grid(row=0, column=1, padx=5, pady=2, sticky="ew")
-
-            # Title 2
-            ttk.Label(frame, text="Title 2:").grid(row=1, column=0, padx=5, pady=2, sticky="e")
-            title2 = ttk.Entry(frame)
-            title2.grid(row=1, column=1, padx=5, pady=2, sticky="ew")
+    def import_items(self):
+        file_path = filedialog.askopenfilename(
+            initialdir=self.last_directory,
+            filetypes=[("CSV or JSON Lines", "*.csv *.jsonl"), ("All files", "*.*")],
+            title="Import Labels"
+        )
+        if not file_path:
+            return
 
-            # Barcode
-            ttk.Label(frame, text="Barcode:").grid(row=2, column=0, padx=5, pady=2, sticky="e")
-            barcode = ttk.Entry(frame)
-            barcode.grid(row=2, column=1, padx=5, pady=2, sticky="ew")
+        try:
+            with open(file_path, "r", encoding="utf-8-sig", newline="") as f:
+                items = list(item_reader.read_items(f, item_reader.guess_format(file_path)))
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Import Error", f"Could not import labels: {str(e)}")
+            return
 
-            self.item_inputs.append((title1, title2, barcode))
+        self.items = items
+        self.refresh_tree()
 
-        # Update the scroll region
-        self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+    def paste_rows(self):
+        """Paste tab-separated rows (title 1, title 2, barcode) at the selected row"""
+        try:
+            text = self.master.clipboard_get()
+        except tk.TclError:
+            return "break"
+
+        rows = [line.split("\t") for line in text.splitlines() if line.strip()]
+        selection = self.tree.selection()
+        start = int(selection[0]) if selection else len(self.items)
+        for offset, row in enumerate(rows):
+            item = {key: (row[col].strip() if col < len(row) else "") for col, (key, _) in enumerate(COLUMNS)}
+            if start + offset < len(self.items):
+                self.items[start + offset] = item
+            else:
+                self.items.append(item)
+        self.refresh_tree()
+        return "break"
+
+    def delete_selected(self):
+        rows = sorted((int(iid) for iid in self.tree.selection()), reverse=True)
+        for row in rows:
+            del self.items[row]
+        if rows:
+            self.refresh_tree()
+
+    def on_tree_double_click(self, event):
+        iid = self.tree.identify_row(event.y)
+        column = self.tree.identify_column(event.x)  # "#0", "#1", ...
+        if iid and column != "#0":
+            self.start_edit(int(iid), int(column[1:]) - 1)
+
+    def edit_selected(self):
+        selection = self.tree.selection()
+        if selection:
+            self.start_edit(int(selection[0]), 0)
+
+    def start_edit(self, row, col):
+        """Move the editor over a cell and load its value"""
+        iid = str(row)
+        self.tree.see(iid)
+        self.tree.update_idletasks()
+        bbox = self.tree.bbox(iid, COLUMNS[col][0])
+        if not bbox:
+            return
+        x, y, width, height = bbox
+        self.editing = (row, col)
+        self.editor.delete(0, "end")
+        self.editor.insert(0, self.items[row][COLUMNS[col][0]])
+        self.editor.place(x=x, y=y, width=width, height=height)
+        self.editor.focus_set()
+        self.editor.select_range(0, "end")
+
+    def finish_edit(self, step=0):
+        """Store the editor's value in the item list; step moves to the next/previous cell"""
+        if self.editing is None:
+            return "break"
+        row, col = self.editing
+        key = COLUMNS[col][0]
+        self.items[row][key] = self.editor.get()
+        self.tree.set(str(row), key, self.items[row][key])
+        self.cancel_edit()
+        self.schedule_preview()
+
+        if step:
+            index = row * len(COLUMNS) + col + step
+            if 0 <= index < len(self.items) * len(COLUMNS):
+                row, col = divmod(index, len(COLUMNS))
+                self.tree.selection_set(str(row))
+                self.start_edit(row, col)
+        return "break"
+
+    def editor_focus_lost(self):
+        """Commit the cell when focus has really left the editor.
+
+        Tab chains through cancel_edit (focus to the tree) and start_edit (focus back to
+        the editor); the FocusOut queued by the first step must not close the new cell.
+        """
+        if self.editing is not None and self.master.focus_get() is not self.editor:
+            self.finish_edit()
+
+    def cancel_edit(self):
+        self.editing = None
+        self.editor.place_forget()
+        self.tree.focus_set()
+
+    def schedule_preview(self, event=None):
+        """Redraw the preview once edits pause for PREVIEW_DELAY ms"""
+        if self.preview_job is not None:
+            self.master.after_cancel(self.preview_job)
+        self.preview_job = self.master.after(PREVIEW_DELAY, self.update_preview)
+
+    def preview_row(self):
+        """Row to preview and its fields, including text still being typed in the editor"""
+        if self.editing is not None:
+            row, col = self.editing
+            item = dict(self.items[row])
+            item[COLUMNS[col][0]] = self.editor.get()
+            return row, item
+        selection = self.tree.selection()
+        if not selection:
+            return None, None
+        row = int(selection[0])
+        return row, self.items[row]
+
+    def row_geometry(self, row, item):
+        """(key, geometry) of a row's label, recomputed only when its fields or options change"""
+        fit_text = self.fit_text.get()
+        symbology = pdf_generator.item_symbology(item, self.symbology_choice.get())
+        key = (item["title1"], item["title2"], item["barcode"], fit_text, symbology)
+        cached = self.preview_cache.get(row)
+        if cached is None or cached[0] != key:
+            # Bypass the engine's caches: a generation may be using them on the worker thread
+            cached = (key, pdf_generator.label_geometry(item, fit_text, symbology, use_cache=False))
+            self.preview_cache[row] = cached
+        return cached
+
+    def update_preview(self):
+        self.preview_job = None
+        row, item = self.preview_row()
+        if item is None or not item["barcode"]:
+            self.preview.delete("all")
+            self.preview_key = None
+            self.preview_note.configure(text="" if item is None else "Enter a barcode to see a preview")
+            return
+        try:
+            key, geometry = self.row_geometry(row, item)
+        except ValueError as e:
+            self.preview.delete("all")
+            self.preview_key = None
+            self.preview_note.configure(text=str(e))
+            return
+        if key != self.preview_key:  # Same label as on the canvas: nothing to redraw
+            self.draw_preview(geometry)
+            self.preview_key = key
+
+    def preview_font(self, name, size):
+        font = self.preview_fonts.get((name, size))
+        if font is None:
+            font = tkfont.Font(family="Helvetica",
+                               size=-max(1, round(size * PREVIEW_SCALE)),  # Negative: pixels
+                               weight="bold" if name == pdf_generator.FONT_BOLD else "normal")
+            self.preview_fonts[(name, size)] = font
+        return font
+
+    def draw_preview(self, geometry):
+        """Draw one label's bars and text, flagging anything that runs past its edges in red"""
+        width = pdf_generator.LABEL_WIDTH
+        height = pdf_generator.LABEL_HEIGHT
+        scale = PREVIEW_SCALE
+        canvas = self.preview
+        canvas.delete("all")
+        canvas.create_rectangle(1, 1, width * scale - 1, height * scale - 1, outline="gray")
+
+        problems = []
+        bars_fit = not geometry.bars or (geometry.bars[0][0] >= 0 and sum(geometry.bars[-1]) <= width)
+        if not bars_fit:
+            problems.append("barcode")
+        top = (height - geometry.bar_y - geometry.bar_height) * scale
+        bottom = (height - geometry.bar_y) * scale
+        for x, bar_width in geometry.bars:
+            canvas.create_rectangle(x * scale, top, (x + bar_width) * scale, bottom,
+                                    fill="black" if bars_fit else "red", width=0)
+
+        for line, name in zip(geometry.text, ("title 1", "title 2", "barcode text")):
+            fits = line.x >= 0 and line.x + line.width <= width
+            if not fits:
+                problems.append(name)
+            font = self.preview_font(line.font, line.size)
+            # Anchored at the bottom of the text, so drop the baseline by the font's descent
+            canvas.create_text(line.x * scale, (height - line.y) * scale + font.metrics("descent"),
+                               text=line.text, font=font, anchor="sw", fill="black" if fits else "red")
+
+        self.preview_note.configure(
+            text=f"Too wide for the label: {', '.join(problems)}" if problems else "")
 
     def generate_labels(self):
-        if not hasattr(self, 'item_inputs'):
+        self.finish_edit()
+        if self.worker is not None:
+            return
+        if not self.items:
             messagebox.showerror("Error", "Please generate input fields first.")
             return
 
+        # Validate inputs
+        for i, item in enumerate(self.items):
+            if not all(item[key] for key, _ in COLUMNS):
+                self.tree.selection_set(str(i))
+                self.tree.see(str(i))
+                messagebox.showerror("Error", 
+                                   f"Please fill in all fields for Label {i+1}")
+                return
+        items = [dict(item) for item in self.items]
+
+        # Ask user where to save the file
+        initial_dir = self.last_directory
+        file_path = filedialog.asksaveasfilename(
+            initialdir=initial_dir,
+            defaultextension=".pdf",
+            filetypes=[("PDF files", "*.pdf"), ("All files", "*.*")],
+            initialfile="labels.pdf",
+            title="Save Labels PDF"
+        )
+        if not file_path:  # User cancelled
+            return
+
+        # Save the new directory
+        self.last_directory = os.path.dirname(file_path)
+        self.save_last_directory(self.last_directory)
+
+        # Generate and save in the background so the window stays responsive
+        template = pdf_generator.TEMPLATES[self.template_choice.get()]
+        options = {"template": template,
+                   "fit_text": self.fit_text.get(),
+                   "symbology": self.symbology_choice.get()}
+        total_pages = -(-len(items) // template.labels_per_page)
+        self.progress.configure(maximum=total_pages, value=0)
+        self.status_label.configure(text=f"Page 0 of {total_pages}")
+        self.generate_button.configure(state="disabled")
+        self.cancel_button.configure(state="normal")
+        self.cancel_event.clear()
+        self.worker = threading.Thread(target=self.run_generation,
+                                       args=(items, file_path, options, total_pages),
+                                       daemon=True)
+        self.worker.start()
+        self.master.after(POLL_INTERVAL, self.poll_generation)
+
+    def run_generation(self, items, file_path, options, total_pages):
+        """Worker thread: write the PDF, posting progress and the outcome to the event queue"""
+        def report(pages, labels):
+            if self.cancel_event.is_set():
+                raise GenerationCancelled()
+            self.events.put(("progress", pages, total_pages))
+
+        temp_path = file_path + ".part"
+        stats = pdf_generator.RenderStats() if self.log_stats_enabled else None
+        start = time.perf_counter()
         try:
-            # Validate inputs
-            items = []
-            for i, (title1, title2, barcode) in enumerate(self.item_inputs):
-                if not all([title1.get(), title2.get(), barcode.get()]):
-                    messagebox.showerror("Error", 
-                                       f"Please fill in all fields for Label {i+1}")
-                    return
-                
-                items.append({
-                    'title1': title1.get(),
-                    'title2': title2.get(),
-                    'barcode': barcode.get()
-                })
-
-            # Generate PDF
-            pdf_bytes = pdf_generator.create_pdf(items)
-            
-            # Ask user where to save the file
-            initial_dir = self.last_directory
-            file_path = filedialog.asksaveasfilename(
-                initialdir=initial_dir,
-                defaultextension=".pdf",
-                filetypes=[("PDF files", "*.pdf"), ("All files", "*.*")],
-                initialfile="labels.pdf",
-                title="Save Labels PDF"
-            )
-            
-            if file_path:  # User didn't cancel
-                # Save the new directory
-                self.last_directory = os.path.dirname(file_path)
-                self.save_last_directory(self.last_directory)
-                
-                try:
-                    with open(file_path, "wb") as f:
-                        f.write(pdf_bytes)
-                    messagebox.showinfo("Success", 
-                                      f"Labels saved successfully to:\n{file_path}")
-                    
-                    # Ask if user wants to open the generated PDF
-                    if messagebox.askyesno("Open PDF", 
-                                         "Would you like to open the generated PDF?"):
-                        try:
-                            if sys.platform.startswith('win'):
-                                os.startfile(file_path)
-                            elif sys.platform.startswith('darwin'):  # macOS
-                                os.system(f'open "{file_path}"')
-                            else:  # Linux
-                                os.system(f'xdg-open "{file_path}"')
-                        except Exception as e:
-                            messagebox.showwarning("Warning", 
-                                                 f"Could not open PDF automatically: {str(e)}")
-                            
-                except Exception as e:
-                    messagebox.showerror("File Error", 
-                        f"Error saving PDF file: {str(e)}\n"
-                        "Make sure you have write permissions for the selected location.")
-            
+            with open(temp_path, "wb") as f:
+                pdf_generator.write_pdf(items, f, progress=report, stats=stats, **options)
+            os.replace(temp_path, file_path)
+            elapsed = time.perf_counter() - start
+            if stats is not None:
+                self.log_stats(file_path, stats)
+            self.events.put(("done", file_path, elapsed))
+        except GenerationCancelled:
+            self.events.put(("cancelled",))
+        except OSError as e:
+            self.events.put(("file_error", str(e)))
         except Exception as e:
-            messagebox.showerror("Error", f"Error generating PDF: {str(e)}")
             import traceback
             traceback.print_exc()
+            self.events.put(("error", str(e)))
+        finally:
+            if os.path.exists(temp_path):
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+
+    def log_stats(self, file_path, stats):
+        """Append one JSON line with the run's timings and counters to the stats log, rotating it when full"""
+        try:
+            if os.path.exists(self.stats_log) and os.path.getsize(self.stats_log) >= STATS_LOG_MAX_BYTES:
+                os.replace(self.stats_log, self.stats_log + ".1")
+            with open(self.stats_log, "a") as f:
+                f.write(json.dumps(dict(stats.as_dict(), file=file_path)) + "\n")
+        except OSError:
+            pass
+
+    def cancel_generation(self):
+        self.cancel_event.set()
+        self.cancel_button.configure(state="disabled")
+        self.status_label.configure(text="Cancelling...")
+
+    def poll_generation(self):
+        """Apply queued worker events on the Tk thread"""
+        outcome = None
+        try:
+            while True:
+                event = self.events.get_nowait()
+                if event[0] == "progress":
+                    _, pages, total_pages = event
+                    self.progress.configure(value=pages)
+                    if not self.cancel_event.is_set():
+                        self.status_label.configure(text=f"Page {pages} of {total_pages}")
+                else:
+                    outcome = event
+        except queue.Empty:
+            pass
+
+        if outcome is None:
+            self.master.after(POLL_INTERVAL, self.poll_generation)
+            return
+
+        self.worker = None
+        self.generate_button.configure(state="normal")
+        self.cancel_button.configure(state="disabled")
+        kind = outcome[0]
+        if kind == "done":
+            self.status_label.configure(text=f"Done in {outcome[2]:.2f} s")
+            self.show_saved(outcome[1])
+        elif kind == "cancelled":
+            self.progress.configure(value=0)
+            self.status_label.configure(text="Cancelled")
+        elif kind == "file_error":
+            self.status_label.configure(text="Failed")
+            messagebox.showerror("File Error", 
+                f"Error saving PDF file: {outcome[1]}\n"
+                "Make sure you have write permissions for the selected location.")
+        else:
+            self.status_label.configure(text="Failed")
+            messagebox.showerror("Error", f"Error generating PDF: {outcome[1]}")
+
+    def show_saved(self, file_path):
+        messagebox.showinfo("Success", 
+                          f"Labels saved successfully to:\n{file_path}")
+        
+        # Ask if user wants to open the generated PDF
+        if messagebox.askyesno("Open PDF", 
+                             "Would you like to open the generated PDF?"):
+            try:
+                if sys.platform.startswith('win'):
+                    os.startfile(file_path)
+                elif sys.platform.startswith('darwin'):  # macOS
+                    os.system(f'open "{file_path}"')
+                else:  # Linux
+                    os.system(f'xdg-open "{file_path}"')
+            except Exception as e:
+                messagebox.showwarning("Warning", 
+                                     f"Could not open PDF automatically: {str(e)}")
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,77 @@
+import csv
+import json
+from typing import Dict, Iterator, List, Optional, TextIO
+
+# Label fields every item needs
+ITEM_FIELDS = ['title1', 'title2', 'barcode']
+# Label fields copied only when the input has them (a per-item barcode symbology)
+OPTIONAL_FIELDS = ['symbology']
+# Symbology names the engine accepts, as in pdf_generator.SYMBOLOGIES; repeated so this module loads on its own
+SYMBOLOGIES = ('code39', 'code128')
+
+# Supported input formats
+FORMAT_CSV = 'csv'
+FORMAT_JSONL = 'jsonl'
+
+def parse_mapping(specs: List[str]) -> Dict[str, str]:
+    """Turn FIELD=COLUMN strings into a field -> source column mapping."""
+    mapping = {field: field for field in ITEM_FIELDS + OPTIONAL_FIELDS}
+    for spec in specs:
+        field, sep, column = spec.partition('=')
+        if not sep or field not in mapping or not column:
+            raise ValueError(f"Invalid column mapping '{spec}' (expected title1=, title2=, barcode= "
+                             "or symbology=COLUMN)")
+        mapping[field] = column
+    return mapping
+
+def guess_format(path: str) -> str:
+    """Pick the input format from a file name, defaulting to CSV."""
+    return FORMAT_JSONL if path.lower().endswith(('.jsonl', '.ndjson', '.json')) else FORMAT_CSV
+
+def map_record(record: dict, mapping: Dict[str, str], line: int) -> dict:
+    """Build a label item from one input record using the field -> column mapping.
+
+    Rows with an empty barcode or an unknown symbology are rejected here, with their line
+    number, rather than failing later inside the renderer.
+    """
+    item = {}
+    for field, column in mapping.items():
+        if field in OPTIONAL_FIELDS:
+            if record.get(column):
+                item[field] = str(record[column])
+            continue
+        if column not in record:
+            raise ValueError(f"Line {line}: missing column '{column}' for {field}")
+        value = record[column]
+        item[field] = '' if value is None else str(value)
+    if not item['barcode'].strip():
+        raise ValueError(f"Line {line}: empty barcode")
+    if item.get('symbology') and item['symbology'] not in SYMBOLOGIES:
+        raise ValueError(f"Line {line}: unknown barcode symbology '{item['symbology']}' "
+                         f"(choose from {', '.join(SYMBOLOGIES)})")
+    return item
+
+def read_items(fileobj: TextIO, fmt: str = FORMAT_CSV, mapping: Optional[Dict[str, str]] = None) -> Iterator[dict]:
+    """Stream label items from CSV (with a header row) or JSON Lines text.
+
+    Records are read lazily, so arbitrarily large exports can be fed straight into
+    pdf_generator.write_pdf.
+    """
+    mapping = mapping or parse_mapping([])
+    if fmt == FORMAT_CSV:
+        reader = csv.DictReader(fileobj)
+        for record in reader:
+            yield map_record(record, mapping, reader.line_num)
+    elif fmt == FORMAT_JSONL:
+        for line_num, line in enumerate(fileobj, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Line {line_num}: invalid JSON ({e.msg})")
+            if not isinstance(record, dict):
+                raise ValueError(f"Line {line_num}: expected a JSON object")
+            yield map_record(record, mapping, line_num)
+    else:
+        raise ValueError(f"Unsupported input format: {fmt}")
@@ -0,0 +1,259 @@
+import argparse
+import asyncio
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import pdf_generator
+
+# Service defaults; the service only ever listens on the loopback interface
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+LOOPBACK_HOSTS = ('127.0.0.1', '::1', 'localhost')
+
+# Requests arriving within this many seconds of each other share one worker task
+BATCH_WINDOW = 0.005
+# A pending batch is sent off as soon as it holds this many labels
+MAX_BATCH_LABELS = 2000
+
+# Limits on incoming requests
+MAX_BODY_BYTES = 16 * 1024 * 1024
+MAX_HEADER_LINES = 100
+
+# write_pdf options a request may set; workers is fixed by the service
+REQUEST_OPTIONS = ('template', 'fit_text', 'compress_level', 'use_xobjects', 'symbology')
+# Item fields that go straight into the PDF, so JSON numbers, lists, objects or null are refused
+ITEM_STRING_FIELDS = ('title1', 'title2', 'barcode')
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+def warm_worker():
+    """Worker initializer: render one label so imports, fonts and geometry are ready for the first request."""
+    pdf_generator.create_pdf([{'title1': 'WARM', 'title2': 'UP', 'barcode': 'WARM'}])
+
+def render_batch(jobs: List[Tuple[List[dict], dict]]) -> List[Tuple[bool, object]]:
+    """Worker process: render each job of a batch, returning (True, pdf) or (False, message) per job."""
+    results = []
+    for items, options in jobs:
+        try:
+            results.append((True, pdf_generator.create_pdf(items, **options)))
+        except ValueError as e:
+            results.append((False, str(e)))
+    return results
+
+def parse_job(body: bytes) -> Tuple[List[dict], dict]:
+    """Read a request body: a JSON list of items, or an object with "items" and write_pdf options."""
+    try:
+        payload = json.loads(body)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Invalid JSON ({e})")
+    if isinstance(payload, list):
+        payload = {'items': payload}
+    if not isinstance(payload, dict):
+        raise ValueError("Expected a JSON list of items or an object with an 'items' list")
+
+    items = payload.pop('items', None)
+    if not isinstance(items, list) or not items:
+        raise ValueError("No items provided for PDF generation")
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValueError("Each item must be a JSON object")
+        for field in ITEM_STRING_FIELDS:
+            if field in item and not isinstance(item[field], str):
+                raise ValueError(f"Item field '{field}' must be a string")
+        if item.get('symbology') is not None and not isinstance(item['symbology'], str):
+            raise ValueError("Item field 'symbology' must be a string or null")
+        pdf_generator.validate_item(item)
+    unknown = set(payload) - set(REQUEST_OPTIONS)
+    if unknown:
+        raise ValueError(f"Unknown option(s): {', '.join(sorted(unknown))}")
+
+    for name in ('template', 'symbology'):
+        if payload.get(name) is not None and not isinstance(payload[name], str):
+            raise ValueError(f"Option '{name}' must be a string")
+    for name in ('fit_text', 'use_xobjects'):
+        if name in payload and not isinstance(payload[name], bool):
+            raise ValueError(f"Option '{name}' must be true or false")
+    level = payload.get('compress_level')
+    if level is not None and (isinstance(level, bool) or not isinstance(level, int) or not 0 <= level <= 9):
+        raise ValueError("Option 'compress_level' must be null or an integer from 0 to 9")
+    if payload.get('template') is not None:
+        pdf_generator.resolve_template(payload['template'])
+    if payload.get('symbology') is not None:
+        pdf_generator.validate_symbology(payload['symbology'])
+    return items, payload
+
+class Batcher:
+    """Collects jobs from concurrent requests and renders them together in the worker pool."""
+
+    def __init__(self, executor: ProcessPoolExecutor, window: float = BATCH_WINDOW,
+                 max_labels: int = MAX_BATCH_LABELS):
+        self.executor = executor
+        self.window = window
+        self.max_labels = max_labels
+        self.pending = []  # (job, future) pairs waiting for the next flush
+        self.pending_labels = 0
+        self.flush_handle = None
+
+    async def render(self, items: List[dict], options: dict) -> Tuple[bool, object]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append(((items, options), future))
+        self.pending_labels += len(items)
+        if self.pending_labels >= self.max_labels:
+            self.flush()
+        elif self.flush_handle is None:
+            self.flush_handle = loop.call_later(self.window, self.flush)
+        return await future
+
+    def flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        batch, self.pending, self.pending_labels = self.pending, [], 0
+        if not batch:
+            return
+        loop = asyncio.get_running_loop()
+        task = loop.run_in_executor(self.executor, render_batch, [job for job, _ in batch])
+        task.add_done_callback(lambda done: self.deliver(batch, done))
+
+    @staticmethod
+    def deliver(batch, done):
+        """Hand each request its own result, or the worker failure to all of them."""
+        error = done.exception()
+        results = [None] * len(batch) if error else done.result()
+        for (_, future), result in zip(batch, results):
+            if future.done():  # The client went away
+                continue
+            if error:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+class LabelService:
+    """Minimal HTTP/1.1 front end: POST /labels returns a PDF, GET /health reports readiness."""
+
+    def __init__(self, batcher: Batcher):
+        self.batcher = batcher
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            keep_alive = True
+            while keep_alive:
+                request = await self.read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                status, content_type, payload = await self.dispatch(method, path, body)
+                self.write_response(writer, status, content_type, payload, keep_alive)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except ValueError as e:  # Malformed HTTP; answer once and hang up
+            self.write_response(writer, 400, *self.error_body(str(e)), keep_alive=False)
+        finally:
+            writer.close()
+
+    async def read_request(self, reader: asyncio.StreamReader) -> Optional[tuple]:
+        """Parse one request; None when the client closed the connection between requests."""
+        line = await reader.readline()
+        if not line:
+            return None
+        parts = line.decode('latin-1').split()
+        if len(parts) != 3 or not parts[2].startswith('HTTP/'):
+            raise ValueError("Malformed request line")
+        method, path, _ = parts
+
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise ValueError("Too many header lines")
+
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise ValueError("Invalid Content-Length")
+        if length < 0 or length > MAX_BODY_BYTES:
+            raise ValueError(f"Request body must be at most {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b''
+        return method, path.split('?', 1)[0], headers, body
+
+    async def dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, str, bytes]:
+        if path == '/health':
+            if method != 'GET':
+                return (405,) + self.error_body("Use GET")
+            return 200, 'application/json', b'{"status": "ok"}'
+        if path != '/labels':
+            return (404,) + self.error_body(f"No such endpoint: {path}")
+        if method != 'POST':
+            return (405,) + self.error_body("Use POST")
+
+        try:
+            items, options = parse_job(body)
+        except ValueError as e:
+            return (400,) + self.error_body(str(e))
+        try:
+            ok, result = await self.batcher.render(items, options)
+        except Exception as e:
+            return (500,) + self.error_body(f"Rendering failed: {e}")
+        if not ok:
+            return (400,) + self.error_body(result)
+        return 200, 'application/pdf', result
+
+    @staticmethod
+    def error_body(message: str) -> Tuple[str, bytes]:
+        return 'application/json', json.dumps({'error': message}).encode('utf-8')
+
+    @staticmethod
+    def write_response(writer: asyncio.StreamWriter, status: int, content_type: str, payload: bytes,
+                       keep_alive: bool = True):
+        head = (f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + payload)
+
+async def serve(host: str, port: int, workers: Optional[int], window: float):
+    with ProcessPoolExecutor(max_workers=workers, initializer=warm_worker) as executor:
+        service = LabelService(Batcher(executor, window))
+        server = await asyncio.start_server(service.handle_connection, host, port)
+        address = server.sockets[0].getsockname()
+        print(f"Serving labels on http://{address[0]}:{address[1]}/labels", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Serve label PDFs over HTTP on this machine, keeping the engine warm between jobs.")
+    parser.add_argument('--host', default=DEFAULT_HOST, choices=LOOPBACK_HOSTS,
+                        help="loopback address to listen on (default: %(default)s)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="TCP port (default: %(default)s)")
+    parser.add_argument('--workers', type=int, help="render processes (default: one per CPU)")
+    parser.add_argument('--batch-window', type=float, default=BATCH_WINDOW * 1000, metavar='MS',
+                        help="milliseconds to wait for concurrent requests to batch (default: %(default)g)")
+    return parser
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.workers is not None and args.workers < 1:
+        print("Error: --workers must be at least 1", file=sys.stderr)
+        return 2
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.batch_window / 1000))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,14 @@
-from typing import List, Tuple
+import io
+import re
+import time
+import warnings
+import zlib
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+from array import array
+from functools import lru_cache
+from typing import BinaryIO, Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
 
 # Global font settings
 FONT_REGULAR = 'F1'
@@ -7,9 +17,51 @@ FONT_SIZE_TITLE1 = 20
 FONT_SIZE_TITLE2 = 16
 FONT_SIZE_BARCODE = 14
 
-# Character width approximations (adjust based on your font)
-CHAR_WIDTH_REGULAR = 0.5
-CHAR_WIDTH_BOLD = 0.6
+# Glyph widths of Helvetica and Helvetica-Bold from the standard 14 AFM files, in 1/1000 em,
+# indexed by WinAnsiEncoding byte (codes with no glyph are 0)
+HELVETICA_WIDTHS = (
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584, 0,
+    556, 0, 222, 556, 333, 1000, 556, 556, 333, 1000, 667, 333, 1000, 0, 611, 0,
+    0, 222, 222, 333, 333, 350, 556, 1000, 333, 1000, 500, 333, 944, 0, 500, 667,
+    278, 333, 556, 556, 556, 556, 260, 556, 333, 737, 370, 556, 584, 333, 737, 333,
+    400, 584, 333, 333, 333, 556, 537, 278, 333, 333, 365, 556, 834, 834, 834, 611,
+    667, 667, 667, 667, 667, 667, 1000, 722, 667, 667, 667, 667, 278, 278, 278, 278,
+    722, 722, 778, 778, 778, 778, 778, 584, 778, 722, 722, 722, 722, 667, 667, 611,
+    556, 556, 556, 556, 556, 556, 889, 500, 556, 556, 556, 556, 278, 278, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 584, 611, 556, 556, 556, 556, 500, 556, 500,
+)
+
+HELVETICA_BOLD_WIDTHS = (
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584, 0,
+    556, 0, 278, 556, 500, 1000, 556, 556, 333, 1000, 667, 333, 1000, 0, 611, 0,
+    0, 278, 278, 500, 500, 350, 556, 1000, 333, 1000, 556, 333, 944, 0, 500, 667,
+    278, 333, 556, 556, 556, 556, 280, 556, 333, 737, 370, 556, 584, 333, 737, 333,
+    400, 584, 333, 333, 333, 611, 556, 278, 333, 333, 365, 556, 834, 834, 834, 611,
+    722, 722, 722, 722, 722, 722, 1000, 722, 667, 667, 667, 667, 278, 278, 278, 278,
+    722, 722, 778, 778, 778, 778, 778, 584, 778, 722, 722, 722, 722, 667, 667, 611,
+    556, 556, 556, 556, 556, 556, 889, 556, 556, 556, 556, 556, 278, 278, 278, 278,
+    611, 611, 611, 611, 611, 611, 611, 584, 611, 611, 611, 611, 611, 556, 611, 556,
+)
+
+
+# Title fitting
+TEXT_PADDING = 8  # Clear space kept at each side of a fitted title
+MIN_FONT_SCALE = 0.6  # Smallest size a title shrinks to, relative to its nominal size
+ELLIPSIS = '\u2026'
 
 # Label dimensions
 LABEL_WIDTH = 300
@@ -17,213 +69,1119 @@ LABEL_HEIGHT = 160
 LABEL_MARGIN_LEFT = 76
 LABEL_MARGIN_BOTTOM = 4
 
+# Page layout of the default template
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+LABELS_PER_PAGE = 4
+
 # Barcode dimensions
 BARCODE_HEIGHT = 50
 BAR_WIDTH_NARROW = 1.5  # Barcode width modifier
+MIN_NARROW_BAR = 0.54  # 7.5 mil, the narrowest bar general-purpose scanners read reliably, in points
 
-def generate_code39(data: str) -> List[Tuple[int, int, int, int]]:
-    """Generate Code 39 barcode as a list of rectangles."""
-    chars = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ-. $/+%*"
-    patterns = [
-        "1010001110111010", "1110100010101110", "1011100010101110", "1110111000101010",
-        "1010001110101110", "1110100011101010", "1011100011101010", "1010001011101110",
-        "1110100010111010", "1011100010111010", "1110101000101110", "1011101000101110",
-        "1110111010001010", "1010111000101110", "1110101110001010", "1011101110001010",
-        "1010100011101110", "1110101000111010", "1011101000111010", "1010111000111010",
-        "1110101010001110", "1011101010001110", "1110111010100010", "1010111010001110",
-        "1110101110100010", "1011101110100010", "1010101110001110", "1110101011100010",
-        "1011101011100010", "1010111011100010", "1110001010101110", "1000111010101110",
-        "1110001110101010", "1000101110101110", "1110001011101010", "1000111011101010",
-        "1000101011101110", "1110001010111010", "1000111010111010", "1000100010001010",
-        "1000100010100010", "1000101000100010", "1010001000100010", "1000101110111010"
-    ]
-    
-    rectangles = []
-    x, y = 0, 0
+# Cache sizes (0 disables a cache)
+BARCODE_CACHE_SIZE = 4096
+LABEL_CACHE_SIZE = 1024
+
+# Parallel rendering
+PARALLEL_CHUNK_PAGES = 32  # Pages per task sent to a worker process
+
+class LabelTemplate(NamedTuple):
+    """Sheet layout in points: page size, a grid of label slots, and each slot's size.
+
+    Margins locate the top-left slot from the page's top-left corner; gutters are the
+    gaps between neighbouring slots. Label content is designed at LABEL_WIDTH x
+    LABEL_HEIGHT and scaled down to fit smaller slots; without a cutting guide, anything
+    that still overflows is clipped to the slot.
+    """
+    name: str
+    page_width: float
+    page_height: float
+    columns: int
+    rows: int
+    label_width: float
+    label_height: float
+    margin_left: float
+    margin_top: float
+    gutter_x: float = 0
+    gutter_y: float = 0
+    cutting_guide: bool = False  # Draw the border and dashed cutting guide around each label
+
+    @property
+    def labels_per_page(self) -> int:
+        return self.columns * self.rows
+
+MM = 72 / 25.4  # Points per millimetre
+
+# Built-in sheet templates; letter-4 is the original layout with cutting guides. avery-5160 and a4-21
+# scale barcodes below MIN_NARROW_BAR, so template_warning flags them
+TEMPLATES = {template.name: template for template in [
+    LabelTemplate('letter-4', PAGE_WIDTH, PAGE_HEIGHT, 1, LABELS_PER_PAGE, LABEL_WIDTH, LABEL_HEIGHT,
+                  LABEL_MARGIN_LEFT, 20, gutter_y=38, cutting_guide=True),
+    LabelTemplate('avery-5164', 612, 792, 2, 3, 288, 240, 11.25, 36, gutter_x=13.5),  # 4" x 3-1/3", 6 up
+    LabelTemplate('avery-5163', 612, 792, 2, 5, 288, 144, 11.25, 36, gutter_x=13.5),  # 4" x 2", 10 up
+    LabelTemplate('avery-5160', 612, 792, 3, 10, 189, 72, 13.5, 36, gutter_x=9),  # 2-5/8" x 1", 30 up
+    LabelTemplate('a4-8', 210*MM, 297*MM, 2, 4, 99.1*MM, 67.7*MM, 4.65*MM, 13.1*MM, gutter_x=2.5*MM),  # L7165
+    LabelTemplate('a4-21', 210*MM, 297*MM, 3, 7, 63.5*MM, 38.1*MM, 7.25*MM, 15.15*MM, gutter_x=2.5*MM),  # L7160
+]}
+DEFAULT_TEMPLATE = TEMPLATES['letter-4']
+
+# Barcode symbologies; an item's optional 'symbology' field overrides the write_pdf option
+SYMBOLOGY_CODE39 = 'code39'
+SYMBOLOGY_CODE128 = 'code128'
+SYMBOLOGIES = (SYMBOLOGY_CODE39, SYMBOLOGY_CODE128)
+
+class RenderOptions(NamedTuple):
+    """Settings that shape every page's content stream, passed whole to worker processes."""
+    template: LabelTemplate = DEFAULT_TEMPLATE
+    use_xobjects: bool = False
+    compress_level: Optional[int] = None
+    fit_text: bool = False
+    symbology: str = SYMBOLOGY_CODE39
+
+# Code 39 symbol set; each pattern is 16 modules, '1' for bar and '0' for space
+CODE39_CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ-. $/+%*"
+CODE39_PATTERNS = [
+    "1010001110111010", "1110100010101110", "1011100010101110", "1110111000101010",
+    "1010001110101110", "1110100011101010", "1011100011101010", "1010001011101110",
+    "1110100010111010", "1011100010111010", "1110101000101110", "1011101000101110",
+    "1110111010001010", "1010111000101110", "1110101110001010", "1011101110001010",
+    "1010100011101110", "1110101000111010", "1011101000111010", "1010111000111010",
+    "1110101010001110", "1011101010001110", "1110111010100010", "1010111010001110",
+    "1110101110100010", "1011101110100010", "1010101110001110", "1110101011100010",
+    "1011101011100010", "1010111011100010", "1110001010101110", "1000111010101110",
+    "1110001110101010", "1000101110101110", "1110001011101010", "1000111011101010",
+    "1000101011101110", "1110001010111010", "1000111010111010", "1000100010001010",
+    "1000100010100010", "1000101000100010", "1010001000100010", "1000101110111010"
+]
+
+def build_code39_bars() -> dict:
+    """Precompute each character's bars as (offset, width) runs, merging adjacent bar modules."""
     narrow_width = BAR_WIDTH_NARROW
     wide_width = narrow_width * 3
-    height = 100
-
-    # Pre-process the data to ensure valid characters
-    processed_data = ""
-    for char in data.upper():  # Convert to uppercase
-        if char.isalnum():  # If alphanumeric, keep it
-            processed_data += char
-        elif char in "-. $/+%":  # If valid special character, keep it
-            processed_data += char
-        else:  # Replace invalid characters with closest valid ones
-            if char in "[]":
-                processed_data += "/"
-            elif char in "()":
-                processed_data += "-"
-            elif char in "!@#&":
-                processed_data += "$"
-            else:
-                processed_data += "X"  # Default replacement for invalid chars
+    table = {}
+    for char, pattern in zip(CODE39_CHARS, CODE39_PATTERNS):
+        runs = []
+        x = 0
+        for i, bit in enumerate(pattern):
+            width = wide_width if i % 2 == 0 else narrow_width
+            if bit == '1':
+                if runs and runs[-1][0] + runs[-1][1] == x:  # Extends the previous bar
+                    runs[-1] = (runs[-1][0], runs[-1][1] + width)
+                else:
+                    runs.append((x, width))
+            x += width
+        table[char] = tuple(runs)
+    return table
 
-    if not processed_data:
+class Code39Substitutions(dict):
+    """str.translate table mapping input characters onto the Code 39 set; anything unknown becomes X."""
+
+    def __missing__(self, key):
+        return 'X'  # Default replacement for invalid chars
+
+CODE39_BARS = build_code39_bars()
+CODE39_ADVANCE = 8 * BAR_WIDTH_NARROW + 8 * BAR_WIDTH_NARROW * 3  # Every character is 8 wide + 8 narrow modules
+CODE39_INK_WIDTH = {char: sum(width for _, width in runs) for char, runs in CODE39_BARS.items()}
+CODE39_TRANSLATE = Code39Substitutions(
+    {ord(char): char for char in "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ-. $/+%"})
+CODE39_TRANSLATE.update({ord(char): char.upper() for char in "abcdefghijklmnopqrstuvwxyz"})
+CODE39_TRANSLATE.update({ord(char): "/" for char in "[]"})
+CODE39_TRANSLATE.update({ord(char): "-" for char in "()"})
+CODE39_TRANSLATE.update({ord(char): "$" for char in "!@#&"})
+
+def preprocess_code39(data: str) -> str:
+    """Map data onto the Code 39 character set, replacing unsupported characters."""
+    if not data:
         raise ValueError("No valid barcode characters after processing")
+    return data.translate(CODE39_TRANSLATE)
 
-    def add_char(char):
-        nonlocal x
-        if char not in chars:
-            raise ValueError(f"Invalid character in barcode: {char}")
-        pattern = patterns[chars.index(char)]
-        for i, bit in enumerate(pattern):
-            if bit == '1':
-                width = wide_width if i % 2 == 0 else narrow_width
-                rectangles.append((x, y, width, height))
-            x += wide_width if i % 2 == 0 else narrow_width
+def generate_code39(data: str) -> array:
+    """Generate Code 39 barcode as a flat array of bar positions and widths: x0, w0, x1, w1, ..."""
+    bars = array('d')
+    x = 0.0
+    for char in '*' + preprocess_code39(data) + '*':  # Start and stop characters
+        for offset, width in CODE39_BARS[char]:
+            bars.append(x + offset)
+            bars.append(width)
+        x += CODE39_ADVANCE
+    return bars
+
+# Code 128 symbol values 0-106 as bar/space widths in modules; every symbol is 11 modules, the stop 13
+CODE128_PATTERNS = [
+    "212222", "222122", "222221", "121223", "121322", "131222", "122213", "122312", "132212", "221213",
+    "221312", "231212", "112232", "122132", "122231", "113222", "123122", "123221", "223211", "221132",
+    "221231", "213212", "223112", "312131", "311222", "321122", "321221", "312212", "322112", "322211",
+    "212123", "212321", "232121", "111323", "131123", "131321", "112313", "132113", "132311", "211313",
+    "231113", "231311", "112133", "112331", "132131", "113123", "113321", "133121", "313121", "211331",
+    "231131", "213113", "213311", "213131", "311123", "311321", "331121", "312113", "312311", "332111",
+    "314111", "221411", "431111", "111224", "111422", "121124", "121421", "141122", "141221", "112214",
+    "112412", "122114", "122411", "142112", "142211", "241211", "221114", "413111", "241112", "134111",
+    "111242", "121142", "121241", "114212", "124112", "124211", "411212", "421112", "421211", "212141",
+    "214121", "412121", "111143", "111341", "131141", "114113", "114311", "411113", "411311", "113141",
+    "114131", "311141", "411131", "211412", "211214", "211232", "2331112",
+]
+
+# Code sets and their special symbol values
+CODE128_A, CODE128_B, CODE128_C = 'A', 'B', 'C'
+CODE128_START = {CODE128_A: 103, CODE128_B: 104, CODE128_C: 105}
+CODE128_SWITCH = {CODE128_A: 101, CODE128_B: 100, CODE128_C: 99}  # Symbol that switches to each set
+CODE128_STOP = 106
+CODE128_MIN_DIGIT_RUN = 4  # Shortest digit run worth switching to code set C for
+
+def build_code128_bars() -> list:
+    """Precompute each symbol value's bars as (offset, width) runs in the same units as CODE39_BARS."""
+    table = []
+    for pattern in CODE128_PATTERNS:
+        runs = []
+        x = 0
+        for i, modules in enumerate(pattern):
+            width = int(modules) * BAR_WIDTH_NARROW
+            if i % 2 == 0:  # Patterns alternate bar, space, bar, ...
+                runs.append((x, width))
+            x += width
+        table.append(tuple(runs))
+    return table
+
+CODE128_BARS = build_code128_bars()
+CODE128_ADVANCE = 11 * BAR_WIDTH_NARROW
 
+def code128_digit_run(data: str, start: int) -> int:
+    """Number of consecutive digits in data from start."""
+    end = start
+    while end < len(data) and data[end].isdigit() and data[end].isascii():
+        end += 1
+    return end - start
+
+def code128_set_for(data: str, start: int) -> str:
+    """Code set A or B for text from start: A if a control character comes before any lowercase letter."""
+    for char in data[start:]:
+        if char < ' ':
+            return CODE128_A
+        if '`' <= char:
+            return CODE128_B
+    return CODE128_B
+
+def code128_values(data: str) -> List[int]:
+    """Encode ASCII data as Code 128 symbol values with automatic A/B/C switching, checksum and stop.
+
+    Runs of CODE128_MIN_DIGIT_RUN or more digits (or data that is all digits) are packed two per
+    symbol in set C; an odd digit before such a run stays in the current set.
+    """
+    def wants_c(i):
+        run = code128_digit_run(data, i)
+        return run >= CODE128_MIN_DIGIT_RUN or (run == len(data) - i and run >= 2 and run % 2 == 0)
+
+    code_set = CODE128_C if wants_c(0) else code128_set_for(data, 0)
+    values = [CODE128_START[code_set]]
+    i = 0
+    while i < len(data):
+        if code_set != CODE128_C:
+            run = code128_digit_run(data, i)
+            if run >= CODE128_MIN_DIGIT_RUN and run % 2 == 0:
+                code_set = CODE128_C
+                values.append(CODE128_SWITCH[code_set])
+                continue
+        if code_set == CODE128_C:
+            if code128_digit_run(data, i) >= 2:
+                values.append(int(data[i:i + 2]))
+                i += 2
+                continue
+            code_set = code128_set_for(data, i)
+            values.append(CODE128_SWITCH[code_set])
+
+        code = ord(data[i])
+        if code_set == CODE128_A and '`' <= data[i]:
+            code_set = CODE128_B
+            values.append(CODE128_SWITCH[code_set])
+        elif code_set == CODE128_B and code < 32:
+            code_set = CODE128_A
+            values.append(CODE128_SWITCH[code_set])
+        values.append(code + 64 if code < 32 else code - 32)
+        i += 1
+
+    values.append((values[0] + sum(i * value for i, value in enumerate(values))) % 103)  # Start weighs 1
+    values.append(CODE128_STOP)
+    return values
+
+def preprocess_code128(data: str) -> str:
+    """Limit data to the ASCII range Code 128 encodes directly; anything else becomes '?'."""
+    if not data:
+        raise ValueError("No valid barcode characters after processing")
+    return data.encode('ascii', 'replace').decode('ascii')
+
+def generate_code128(data: str) -> array:
+    """Generate a Code 128 barcode in the same flat x0, w0, x1, w1, ... form as generate_code39."""
+    bars = array('d')
+    x = 0.0
+    for value in code128_values(preprocess_code128(data)):
+        for offset, width in CODE128_BARS[value]:
+            bars.append(x + offset)
+            bars.append(width)
+        x += CODE128_ADVANCE
+    return bars
+
+BARCODE_GENERATORS = {SYMBOLOGY_CODE39: generate_code39, SYMBOLOGY_CODE128: generate_code128}
+
+def item_symbology(item: dict, default: str = SYMBOLOGY_CODE39) -> str:
+    """The symbology an item's barcode is drawn in: its own 'symbology' field, else default."""
+    return item.get('symbology') or default
+
+class LRUCache:
+    """Bounded least-recently-used cache that counts hits and misses."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.data = OrderedDict()
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss."""
+        value = self.data.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self.data[key] = value
+        self.data.move_to_end(key)
+        if len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def resize(self, maxsize: int):
+        """Change the bound, evicting the least recently used entries if needed."""
+        self.maxsize = maxsize
+        while len(self.data) > max(maxsize, 0):
+            self.data.popitem(last=False)
+
+    def clear(self):
+        self.data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def info(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.data), 'maxsize': self.maxsize}
+
+BARCODE_CACHE = LRUCache(BARCODE_CACHE_SIZE)  # (symbology, barcode data) -> generated bars
+LABEL_CACHE = LRUCache(LABEL_CACHE_SIZE)  # Label fields and mode -> rendered label operators
+
+def cache_info() -> dict:
+    """Report hit/miss counters and sizes of the barcode and label caches."""
+    return {'barcode': BARCODE_CACHE.info(), 'label': LABEL_CACHE.info()}
+
+# Seconds spent encoding barcodes and laying out text while render_pages measures a run, else None
+PROFILE: Optional[dict] = None
+
+def profiled(phase: str, func: Callable, *args):
+    """Call func(*args), adding the time it takes to PROFILE[phase] when a run is being measured."""
+    if PROFILE is None:
+        return func(*args)
+    start = time.perf_counter()
     try:
-        # Start character
-        add_char('*')
+        return func(*args)
+    finally:
+        PROFILE[phase] += time.perf_counter() - start
+
+def encode_barcode(data: str, symbology: str = SYMBOLOGY_CODE39) -> array:
+    """Generate bars in a symbology through BARCODE_CACHE; the returned array must not be modified."""
+    key = (symbology, data)
+    barcode = BARCODE_CACHE.get(key)
+    if barcode is None:
+        barcode = profiled('encode', BARCODE_GENERATORS[symbology], data)
+        BARCODE_CACHE.put(key, barcode)
+    return barcode
+
+def build_string_escapes() -> dict:
+    """str.translate table turning WinAnsi bytes (as latin-1 chars) into PDF literal-string text."""
+    table = {code: '\\%03o' % code for code in range(256) if not 32 <= code < 127}
+    table.update({ord('\\'): '\\\\', ord('('): '\\(', ord(')'): '\\)'})
+    return table
+
+PDF_STRING_ESCAPES = build_string_escapes()
+
+def escape_pdf_string(s: str) -> str:
+    """Encode text for a WinAnsiEncoding font as the ASCII body of a PDF literal string.
+
+    Characters outside Windows-1252 become '?'; other non-ASCII bytes are written as
+    octal escapes, so content streams stay pure ASCII and byte offsets stay exact.
+    """
+    return s.encode('cp1252', 'replace').decode('latin-1').translate(PDF_STRING_ESCAPES)
+
+def get_string_width(s: str, font_size: float, font_type: str) -> float:
+    """Width of s in points, summed from the AFM widths of the WinAnsi bytes that get drawn."""
+    widths = HELVETICA_BOLD_WIDTHS if font_type == FONT_BOLD else HELVETICA_WIDTHS
+    return sum(map(widths.__getitem__, s.encode('cp1252', 'replace'))) * font_size / 1000
+
+def fit_title(s: str, font_size: float, font_type: str, max_width: float) -> Tuple[str, float]:
+    """Shrink a title's font size, down to MIN_FONT_SCALE, then truncate it with an ellipsis to fit max_width."""
+    width = get_string_width(s, font_size, font_type)
+    if width <= max_width:
+        return s, font_size
+
+    min_size = font_size * MIN_FONT_SCALE
+    if width * MIN_FONT_SCALE <= max_width:
+        return s, max(min_size, int(font_size * max_width / width * 100) / 100)  # Round down to 0.01 pt
+
+    # Still too wide at the smallest size: keep as many characters as fit before the ellipsis
+    widths = HELVETICA_BOLD_WIDTHS if font_type == FONT_BOLD else HELVETICA_WIDTHS
+    budget = max_width * 1000 / min_size - get_string_width(ELLIPSIS, 1000, font_type)
+    used = 0
+    keep = 0
+    for width in map(widths.__getitem__, s.encode('cp1252', 'replace')):
+        used += width
+        if used > budget:
+            break
+        keep += 1
+    return s[:keep].rstrip() + ELLIPSIS, min_size
+
+def validate_symbology(symbology: str):
+    """Raise ValueError for a symbology name that is not in SYMBOLOGIES."""
+    if symbology not in SYMBOLOGIES:
+        raise ValueError(f"Unknown barcode symbology '{symbology}' (choose from {', '.join(SYMBOLOGIES)})")
+
+def validate_item(item: dict):
+    """Raise ValueError if an item is missing one of the required label fields or names an unknown symbology."""
+    if not all(key in item for key in ['title1', 'title2', 'barcode']):
+        raise ValueError("Missing required fields in item (title1, title2, or barcode)")
+    if item.get('symbology'):
+        validate_symbology(item['symbology'])
+
+def xobject_name(char: str) -> str:
+    """Resource name of the Form XObject that draws one Code 39 character."""
+    return 'C%02X' % ord(char)
+
+def render_label_frame() -> str:
+    """Build the static border and cutting guide in label coordinates."""
+    return '\n'.join([
+        '2 w',  # Set line width to 2
+        '0.8 0.8 0.8 RG',  # Set stroke color to light gray
+        f'0 {LABEL_MARGIN_BOTTOM} {LABEL_WIDTH} {LABEL_HEIGHT} re S',  # Draw main border
+        '[4 4] 0 d',  # Set dash pattern
+        '1 w',  # Set line width to 1
+        '0 0 0 RG',  # Set stroke color to black
+        f'-10 -6 {LABEL_WIDTH+20} {LABEL_HEIGHT+20} re S',  # Draw cutting guide
+    ])
+
+def render_code39_glyph(char: str) -> str:
+    """Build the bars of one Code 39 character at unit height, for its glyph XObject."""
+    return '\n'.join([f'{offset} 0 {width} 1 re' for offset, width in CODE39_BARS[char]] + ['f'])
+
+class SheetGeometry(NamedTuple):
+    """Per-template operators computed once: each slot's placement and frame."""
+    placements: Tuple[str, ...]  # 'q ... cm' that maps label coordinates onto the slot
+    frames: Tuple[str, ...]  # Inline border and cutting guide per slot, or empty
+    xobject_frames: Tuple[str, ...]  # The same, drawn with the /Frame XObject
+    scale: float  # Factor the designed label is scaled by to fit a slot
+
+@lru_cache(maxsize=None)
+def sheet_geometry(template: LabelTemplate) -> SheetGeometry:
+    """Compute every slot's transform for a template, filling rows top to bottom, left to right."""
+    right = template.margin_left + template.columns * template.label_width + (template.columns - 1) * template.gutter_x
+    bottom = template.page_height - template.margin_top - template.rows * template.label_height \
+        - (template.rows - 1) * template.gutter_y
+    if template.columns < 1 or template.rows < 1 or right > template.page_width or bottom < 0:
+        raise ValueError(f"Template '{template.name}' does not fit on its page")
+
+    # Scale the designed label uniformly into the slot and center it
+    scale = min(template.label_width / LABEL_WIDTH, template.label_height / LABEL_HEIGHT, 1)
+    offset_x = (template.label_width - LABEL_WIDTH * scale) / 2
+    offset_y = (template.label_height - LABEL_HEIGHT * scale) / 2
+    # Sticker sheets clip each label to its slot so long titles cannot spill onto the next
+    # sticker; the cutting guide is meant to be drawn outside the label, so those stay unclipped
+    slot_width, slot_height = template.label_width / scale, template.label_height / scale
+    clip = '' if template.cutting_guide else \
+        f' {(LABEL_WIDTH - slot_width) / 2:g} {(LABEL_HEIGHT - slot_height) / 2:g} {slot_width:g} {slot_height:g} re W n'
+
+    placements = []
+    for row in range(template.rows):
+        for column in range(template.columns):
+            x = template.margin_left + column * (template.label_width + template.gutter_x) + offset_x
+            y = template.page_height - template.margin_top - (row + 1) * template.label_height \
+                - row * template.gutter_y + offset_y
+            placements.append(f'q {scale:g} 0 0 {scale:g} {x:g} {y:g} cm{clip}')
+
+    if template.cutting_guide:
+        frame = render_label_frame()
+        frames = tuple(f'{placement}\n{frame}\nQ' for placement in placements)
+        xobject_frames = tuple(f'{placement} /Frame Do Q' for placement in placements)
+    else:
+        frames = xobject_frames = ('',) * len(placements)
+    return SheetGeometry(tuple(placements), frames, xobject_frames, scale)
+
+def resolve_template(template: Union[LabelTemplate, str, None]) -> LabelTemplate:
+    """Accept a LabelTemplate, a built-in template name, or None for the default."""
+    if template is None:
+        return DEFAULT_TEMPLATE
+    if isinstance(template, str):
+        if template not in TEMPLATES:
+            raise ValueError(f"Unknown template '{template}' (choose from {', '.join(TEMPLATES)})")
+        return TEMPLATES[template]
+    return template
 
-        # Process the data
-        for char in processed_data:
-            add_char(char)
+def barcode_caption(data: str, symbology: str = SYMBOLOGY_CODE39) -> str:
+    """Human-readable line printed under a barcode; Code 39 shows its start and stop asterisks."""
+    return '*' + data + '*' if symbology == SYMBOLOGY_CODE39 else data
 
-        # Stop character
-        add_char('*')
+class TextLine(NamedTuple):
+    """One line of label text and where it goes, in label coordinates."""
+    text: str
+    font: str  # FONT_REGULAR or FONT_BOLD
+    size: float
+    x: float  # Start of the baseline
+    y: float
+    width: float
 
-    except ValueError as e:
-        raise ValueError(f"Error generating barcode: {str(e)}")
+class LabelGeometry(NamedTuple):
+    """Everything one label draws, in label coordinates (points from its lower-left corner)."""
+    bars: List[Tuple[float, float]]  # (x, width) per bar
+    bar_y: float
+    bar_height: float
+    text: List[TextLine]
 
-    return rectangles
+def layout_label_text(item: dict, fit_text: bool = False, symbology: str = SYMBOLOGY_CODE39) -> List[TextLine]:
+    """Place the centered titles and barcode number.
 
-def create_pdf(items: List[dict]) -> bytes:
-    """Create a PDF with improved label formatting, precisely centered content, and cutting guide."""
-    def escape_pdf_string(s):
-        return s.replace('(', '\\(').replace(')', '\\)').replace('\\', '\\\\')
+    With fit_text, titles wider than the label are shrunk and then truncated to fit.
+    """
+    center_x = LABEL_WIDTH / 2
+    title1, title1_size = item["title1"], FONT_SIZE_TITLE1
+    title2, title2_size = item["title2"], FONT_SIZE_TITLE2
+    if fit_text:
+        max_width = LABEL_WIDTH - 2 * TEXT_PADDING
+        title1, title1_size = fit_title(title1, title1_size, FONT_BOLD, max_width)
+        title2, title2_size = fit_title(title2, title2_size, FONT_REGULAR, max_width)
+    barcode_text = barcode_caption(item["barcode"], symbology)
+    title1_width = get_string_width(title1, title1_size, FONT_BOLD)
+    title2_width = get_string_width(title2, title2_size, FONT_REGULAR)
+    barcode_text_width = get_string_width(barcode_text, FONT_SIZE_BARCODE, FONT_REGULAR)
+    return [
+        # Title 1, larger bold font
+        TextLine(title1, FONT_BOLD, title1_size, center_x - (title1_width / 2), LABEL_HEIGHT-30, title1_width),
+        # Title 2, smaller regular font
+        TextLine(title2, FONT_REGULAR, title2_size, center_x - (title2_width / 2), LABEL_HEIGHT-55, title2_width),
+        # Barcode number
+        TextLine(barcode_text, FONT_REGULAR, FONT_SIZE_BARCODE, center_x - (barcode_text_width / 2), 20,
+                 barcode_text_width),
+    ]
+
+def render_label_text(item: dict, fit_text: bool = False, symbology: str = SYMBOLOGY_CODE39) -> List[str]:
+    """Build the text lines from layout_label_text as one text object, in label coordinates."""
+    content = ['BT', '0 0 0 rg']  # Black color
+    for line in profiled('layout', layout_label_text, item, fit_text, symbology):
+        content.append(f'/{line.font} {line.size:g} Tf')
+        content.append(f'1 0 0 1 {line.x} {line.y} Tm')
+        content.append(f'({escape_pdf_string(line.text)}) Tj')
+    content.append('ET')
+    return content
+
+def barcode_origin(width: float, symbology: str = SYMBOLOGY_CODE39) -> Tuple[float, float]:
+    """Lower-left corner of a barcode in label coordinates.
+
+    Code 39 keeps its original placement: width is the ink width of its bars, and the
+    barcode sits left of centre. Other symbologies pass their full symbol width and are
+    centred under their caption.
+    """
+    if symbology == SYMBOLOGY_CODE39:
+        x = LABEL_WIDTH / 2 - (width / 2) - 50
+    else:
+        x = (LABEL_WIDTH - width) / 2
+    y = (LABEL_HEIGHT - BARCODE_HEIGHT) / 3  # Bottom third vertically
+    return x, y
+
+def label_bars(data: str, symbology: str = SYMBOLOGY_CODE39,
+               use_cache: bool = True) -> Tuple[List[Tuple[float, float]], float]:
+    """Bars of a barcode as (x, width) pairs in label coordinates, and their bottom edge.
+
+    With use_cache=False the bars are generated without touching BARCODE_CACHE, which
+    is not thread-safe.
+    """
+    barcode = encode_barcode(data, symbology) if use_cache else BARCODE_GENERATORS[symbology](data)
+    if symbology == SYMBOLOGY_CODE39:
+        width = sum(barcode[1::2])
+    else:  # The stop pattern ends in a bar, so the last bar's far edge is the full symbol width
+        width = barcode[-2] + barcode[-1]
+    barcode_start_x, barcode_start_y = barcode_origin(width * 0.5, symbology)
+    bars = [(barcode_start_x + barcode[j]*0.5, barcode[j+1]*0.5) for j in range(0, len(barcode), 2)]
+    return bars, barcode_start_y
+
+def label_geometry(item: dict, fit_text: bool = False, symbology: str = SYMBOLOGY_CODE39,
+                   use_cache: bool = True) -> LabelGeometry:
+    """The bars and text one label draws, as render_label emits them; for previews and checks.
+
+    Pass use_cache=False from threads other than the one running write_pdf.
+    """
+    bars, bar_y = label_bars(item['barcode'], symbology, use_cache)
+    return LabelGeometry(bars, bar_y, BARCODE_HEIGHT, layout_label_text(item, fit_text, symbology))
+
+def render_label(item: dict, fit_text: bool = False, symbology: str = SYMBOLOGY_CODE39) -> str:
+    """Build one label's operators in label coordinates, drawing every bar inline."""
+    bars, barcode_start_y = label_bars(item['barcode'], symbology)
+
+    content = ['0 g']  # Black bars
+    for x, width in bars:
+        content.append(f'{x} {barcode_start_y} {width} {BARCODE_HEIGHT} re')
+    content.append('f')
+    content.extend(render_label_text(item, fit_text, symbology))
+    return '\n'.join(content)
+
+def render_label_xobjects(item: dict, symbols: str, fit_text: bool = False) -> str:
+    """Build one label's operators in label coordinates, placing the glyph XObjects."""
+    # Barcode: one scaled placement, then one glyph per character shifted by its advance
+    ops = []
+    barcode_width = 0
+    for char in symbols:
+        barcode_width += CODE39_INK_WIDTH[char]
+        if ops:
+            ops.append(f'1 0 0 1 {CODE39_ADVANCE} 0 cm')
+        ops.append(f'/{xobject_name(char)} Do')
+    barcode_start_x, barcode_start_y = barcode_origin(barcode_width * 0.5)
+
+    content = [
+        '0 g',  # Set fill color to black
+        f'q 0.5 0 0 {BARCODE_HEIGHT} {barcode_start_x} {barcode_start_y} cm ' + ' '.join(ops) + ' Q',
+    ]
+    content.extend(render_label_text(item, fit_text))
+    return '\n'.join(content)
+
+def label_fragment(item: dict, options: RenderOptions = RenderOptions()) -> Tuple[str, str]:
+    """Return one label's operators and the Code 39 symbols it draws, from LABEL_CACHE when possible.
+
+    The operators are position and template independent; render_page places them with a
+    cm transform, and the template decides whether a frame is drawn around them. Glyph
+    XObjects exist only for Code 39, so other symbologies draw their bars inline.
+    """
+    symbology = item_symbology(item, options.symbology)
+    key = (options.use_xobjects, options.fit_text, symbology, item['title1'], item['title2'], item['barcode'])
+    cached = LABEL_CACHE.get(key)
+    if cached is None:
+        if options.use_xobjects and symbology == SYMBOLOGY_CODE39:
+            symbols = '*' + preprocess_code39(item['barcode']) + '*'
+            cached = (render_label_xobjects(item, symbols, options.fit_text), symbols)
+        else:
+            cached = (render_label(item, options.fit_text, symbology), '')
+        LABEL_CACHE.put(key, cached)
+    return cached
+
+def render_page(page_items: List[dict], options: RenderOptions = RenderOptions(),
+                glyphs: Optional[Counter] = None) -> str:
+    """Build the content stream for one page of up to template.labels_per_page labels.
+
+    When glyphs is given, every Code 39 character placed as an XObject is counted in it so
+    the caller can define that XObject (and count the bars it draws).
+    """
+    geometry = sheet_geometry(options.template)
+    frames = geometry.xobject_frames if options.use_xobjects else geometry.frames
+    content = [frame for frame in frames[:len(page_items)] if frame]
+    for placement, item in zip(geometry.placements, page_items):
+        fragment, symbols = label_fragment(item, options)
+        if glyphs is not None:
+            glyphs.update(symbols)
+        content.append(f'{placement}\n{fragment}\nQ')
+    return '\n'.join(content)
+
+def iter_pages(items: Iterable[dict], labels_per_page: int = LABELS_PER_PAGE) -> Iterator[List[dict]]:
+    """Group validated items into page-sized lists without materializing the whole input."""
+    page_items = []
+    for item in items:
+        validate_item(item)
+        page_items.append(item)
+        if len(page_items) == labels_per_page:
+            yield page_items
+            page_items = []
+    if page_items:
+        yield page_items
+
+def count_page_rects(content: str, labels: int, glyphs: Counter, options: RenderOptions = RenderOptions()) -> int:
+    """Count the rectangles a page draws, including those inside the Frame and glyph XObjects it places.
+
+    glyphs holds how often each glyph XObject was placed, as render_page counts them.
+    """
+    rects = content.count(' re\n') + content.count(' re S')  # Inline bars, then inline frames
+    if options.use_xobjects:
+        if options.template.cutting_guide:
+            rects += render_label_frame().count(' re S') * labels
+        rects += sum(len(CODE39_BARS[char]) * placed for char, placed in glyphs.items())
+    return rects
+
+def render_pages(pages: List[List[dict]], options: RenderOptions = RenderOptions(),
+                 measure: bool = False) -> List[Tuple[int, bytes, str, Optional[dict]]]:
+    """Render a run of pages to finished content streams.
+
+    Returns (label count, stream bytes, Code 39 symbols used, measurements) per page. With
+    measure set, measurements holds the rectangles drawn (see count_page_rects) and the
+    seconds spent in barcode encoding and text layout; otherwise it is None. Defined at
+    module level so a process pool can run it on page-aligned chunks.
+    """
+    global PROFILE
+    rendered = []
+    for page_items in pages:
+        glyphs = Counter()
+        if measure:
+            PROFILE = {'encode': 0.0, 'layout': 0.0}
+        try:
+            content = render_page(page_items, options, glyphs)
+        finally:
+            measured, PROFILE = PROFILE, None
+        if measure:
+            measured['rects'] = count_page_rects(content, len(page_items), glyphs, options)
+        content = content.encode()
+        if options.compress_level is not None:
+            content = zlib.compress(content, options.compress_level)
+        rendered.append((len(page_items), content, ''.join(sorted(glyphs)), measured))
+    return rendered
+
+def iter_rendered_pages(pages: Iterator[List[dict]], options: RenderOptions, workers: int,
+                        measure: bool = False) -> Iterator[Tuple[int, bytes, str, Optional[dict]]]:
+    """Render pages in order, in this process or spread over a pool of worker processes."""
+    if workers <= 1:
+        for page_items in pages:
+            yield from render_pages([page_items], options, measure)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in iter(lambda: list(islice(pages, PARALLEL_CHUNK_PAGES)), []):
+            pending.append(executor.submit(render_pages, chunk, options, measure))
+            if len(pending) >= workers * 2:  # Bound the work in flight to keep memory flat
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+class RenderStats:
+    """Phase timings and counters for write_pdf or append_pdf runs, collected when passed as stats=.
+
+    Phases, in seconds: input (reading and validating items), encode (barcode generation
+    on BARCODE_CACHE misses), layout (text measurement and placement on LABEL_CACHE
+    misses), render (the rest of content stream formatting, and compression), write
+    (object serialization and file output) and xref (page tree, xref table and trailer).
+    With workers > 1, encode and layout add up the time of the worker processes, which
+    overlaps render instead of being taken out of it; parallel holds that overlap, so
+    total() stays wall-clock time. Counts cover labels, pages, rectangles drawn (bars and
+    frames, inline or through XObjects) and bytes written; cache holds the hits and misses
+    of this process's caches during the run (with workers > 1 most rendering, and so most
+    cache use, happens in the worker processes). One object may be reused to add up
+    several runs. Without a stats object none of this is measured.
+    """
+
+    def __init__(self):
+        self.phases = dict.fromkeys(('input', 'encode', 'layout', 'render', 'write', 'xref'), 0.0)
+        self.counts = dict.fromkeys(('labels', 'pages', 'rects', 'bytes'), 0)
+        self.cache = {}
+        self.parallel = 0.0
+
+    def total(self) -> float:
+        """Wall-clock seconds of the measured runs."""
+        return sum(self.phases.values()) - self.parallel
+
+    def timed(self, phase: str, iterable: Iterable) -> Iterator:
+        """Yield from iterable, adding the time spent producing each item to phase."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.phases[phase] += time.perf_counter() - start
+                return
+            self.phases[phase] += time.perf_counter() - start
+            yield item
+
+    def add_cache_use(self, before: dict, after: dict):
+        """Add the hit and miss counts between two cache_info() snapshots."""
+        for name, info in after.items():
+            use = self.cache.setdefault(name, {'hits': 0, 'misses': 0})
+            use['hits'] += info['hits'] - before[name]['hits']
+            use['misses'] += info['misses'] - before[name]['misses']
+
+    def hit_rate(self, name: str) -> Optional[float]:
+        use = self.cache.get(name)
+        lookups = use['hits'] + use['misses'] if use else 0
+        return use['hits'] / lookups if lookups else None
+
+    def as_dict(self) -> dict:
+        return {
+            'phases': dict(self.phases),
+            'counts': dict(self.counts),
+            'cache': {name: dict(use, hit_rate=self.hit_rate(name)) for name, use in self.cache.items()},
+        }
+
+    def summary(self) -> str:
+        """One line for logs: total time, per-phase times, counts and cache hit rates."""
+        phases = ', '.join(f'{phase} {seconds:.3f}s' for phase, seconds in self.phases.items())
+        counts = ', '.join(f'{count} {name}' for name, count in self.counts.items())
+        rates = ', '.join(f'{name} cache {rate:.0%}' for name in self.cache
+                          for rate in [self.hit_rate(name)] if rate is not None)
+        return f"{self.total():.3f}s ({phases}); {counts}" + (f"; {rates}" if rates else "")
+
+class PDFWriter:
+    """Write numbered PDF objects to a binary file, recording each object's byte offset.
+
+    For an incremental update, offset is the length of the existing file and first_obj its
+    xref /Size; objects below first_obj that are written again count as replacements.
+    """
+
+    def __init__(self, fileobj: BinaryIO, offset: int = 0, first_obj: int = 1):
+        self.fileobj = fileobj
+        self.offset = offset
+        self.first_obj = first_obj
+        self.offsets = array('Q')  # Byte offset per object number from first_obj, 0 while unwritten
+        self.replaced = {}  # Object number -> byte offset of a new version of an earlier object
+        self.next_obj = first_obj
+
+    def alloc(self) -> int:
+        """Reserve the next object number."""
+        num = self.next_obj
+        self.next_obj += 1
+        self.offsets.append(0)
+        return num
+
+    def write(self, data: bytes):
+        self.fileobj.write(data)
+        self.offset += len(data)
+
+    def write_obj(self, num: int, body: bytes):
+        if num < self.first_obj:
+            self.replaced[num] = self.offset
+        else:
+            self.offsets[num - self.first_obj] = self.offset
+        self.write(b'%d 0 obj' % num + body + b'endobj\n')
+
+    def write_stream(self, num: int, data: bytes, compress_level: Optional[int] = None,
+                     extra: bytes = b'', compressed: bool = False) -> int:
+        """Write a stream object with an indirect /Length object; return the length object number.
+
+        When compress_level is given the data is Flate-encoded at that zlib level; pass
+        compressed=True for data that is already Flate-encoded. Extra dictionary entries,
+        such as a Form XObject's /Subtype and /BBox, go in extra.
+        """
+        length_num = self.alloc()
+        filter_entry = b''
+        if compress_level is not None and not compressed:
+            data = zlib.compress(data, compress_level)
+            compressed = True
+        if compressed:
+            filter_entry = b'/Filter/FlateDecode'
+        self.write_obj(num, b'<<%s/Length %d 0 R%s>>stream\n' % (extra, length_num, filter_entry) + data + b'\nendstream\n')
+        self.write_obj(length_num, b'\n%d\n' % len(data))
+        return length_num
+
+    def write_trailer(self, root: int, prev: Optional[int] = None):
+        """Write the xref table and trailer for every object written so far.
+
+        With prev (the byte offset of the previous xref), only this section's objects are
+        listed and the trailer chains to the previous xref through /Prev.
+        """
+        xref_start = self.offset
+        size = self.next_obj
+        if prev is None:
+            self.write(b'xref\n0 %d\n0000000000 65535 f \n' % size)
+        else:
+            self.write(b'xref\n' + b''.join(b'%d 1\n%010d 00000 n \n' % (num, offset)
+                                            for num, offset in sorted(self.replaced.items())))
+            self.write(b'%d %d\n' % (self.first_obj, size - self.first_obj))
+        entries = []
+        for offset in self.offsets:
+            if offset:
+                entries.append(b'%010d 00000 n \n' % offset)
+            else:
+                entries.append(b'0000000000 65535 f \n')
+            if len(entries) == 4096:  # Flush in blocks so the xref is never held whole
+                self.write(b''.join(entries))
+                entries = []
+        self.write(b''.join(entries))
+        prev_entry = b'' if prev is None else b'/Prev %d' % prev
+        self.write(b'trailer<</Size %d/Root %d 0 R%s>>\nstartxref\n%d\n%%%%EOF\n' % (size, root, prev_entry, xref_start))
+
+def template_warning(template: Union[LabelTemplate, str, None]) -> Optional[str]:
+    """Explain why a template's barcodes may not scan, or None when its narrow bars are wide enough."""
+    template = resolve_template(template)
+    scale = sheet_geometry(template).scale
+    narrow = BAR_WIDTH_NARROW * 0.5 * scale  # Bars are drawn at half their encoded width
+    if narrow >= MIN_NARROW_BAR:
+        return None
+    return (f"Template '{template.name}' scales labels to {scale:.0%}, so narrow bars are {narrow:.2f} pt, "
+            f"below the {MIN_NARROW_BAR} pt many scanners need; test-scan a sheet before printing a batch")
+
+def make_render_options(compress_level: Optional[int] = None, use_xobjects: bool = False,
+                        template: Union[LabelTemplate, str, None] = None, fit_text: bool = False,
+                        symbology: str = SYMBOLOGY_CODE39) -> RenderOptions:
+    """Validate write_pdf's rendering arguments and bundle them as RenderOptions."""
+    if compress_level is not None and not 0 <= compress_level <= 9:
+        raise ValueError("Compression level must be between 0 and 9")
+    validate_symbology(symbology)
+    options = RenderOptions(resolve_template(template), use_xobjects, compress_level, fit_text, symbology)
+    warning = template_warning(options.template)  # Also rejects templates that do not fit, before writing anything
+    if warning:
+        warnings.warn(warning, stacklevel=3)
+    return options
+
+def write_pages(writer: PDFWriter, pages: Iterable[List[dict]], options: RenderOptions, parent_num: int,
+                workers: int = 1, progress: Optional[Callable[[int, int], None]] = None,
+                stats: Optional[RenderStats] = None) -> Tuple[array, int]:
+    """Write fonts, resources, XObjects and one page object per page under page tree node parent_num.
+
+    Returns the page object numbers and the number of labels written.
+    """
+    font_regular_num = writer.alloc()
+    font_bold_num = writer.alloc()
+    resources_num = writer.alloc()
+    writer.write_obj(font_regular_num, b'<</Type/Font/Subtype/Type1/BaseFont/Helvetica/Encoding/WinAnsiEncoding>>')
+    writer.write_obj(font_bold_num, b'<</Type/Font/Subtype/Type1/BaseFont/Helvetica-Bold/Encoding/WinAnsiEncoding>>')
+
+    compress_level = options.compress_level
+    xobjects = {}  # Resource name -> object number, written once each
+    if options.use_xobjects and options.template.cutting_guide:
+        xobjects['Frame'] = writer.alloc()
+        writer.write_stream(xobjects['Frame'], render_label_frame().encode(), compress_level,
+                            b'/Type/XObject/Subtype/Form/BBox[-11 -7 %d %d]' % (LABEL_WIDTH+11, LABEL_HEIGHT+15))
+
+    kids = array('L')
+    label_count = 0
+    media_box = b'[0 0 %g %g]' % (options.template.page_width, options.template.page_height)
+    rendered = iter_rendered_pages(pages, options, workers, stats is not None)
+    if stats is not None:
+        input_time = stats.phases['input']
+        rendered = stats.timed('render', rendered)  # Includes pulling pages from the input
+    for count, content, symbols, measured in rendered:
+        if stats is not None:
+            write_start = time.perf_counter()
+        page_num = writer.alloc()
+        content_num = writer.alloc()
+        writer.write_obj(page_num, b'<</Type/Page/Parent %d 0 R/MediaBox%s/Contents %d 0 R/Resources %d 0 R>>' % (
+            parent_num, media_box, content_num, resources_num))
+        writer.write_stream(content_num, content, compressed=compress_level is not None)
+
+        # Define glyphs the first time a page uses them
+        for char in symbols:
+            name = xobject_name(char)
+            if name not in xobjects:
+                xobjects[name] = writer.alloc()
+                writer.write_stream(xobjects[name], render_code39_glyph(char).encode(), compress_level,
+                                    b'/Type/XObject/Subtype/Form/BBox[0 0 %d 1]' % CODE39_ADVANCE)
+        kids.append(page_num)
+        label_count += count
+        if stats is not None:
+            stats.phases['write'] += time.perf_counter() - write_start
+            stats.counts['rects'] += measured['rects']
+            for phase in ('encode', 'layout'):
+                stats.phases[phase] += measured[phase]
+                if workers > 1:
+                    stats.parallel += measured[phase]
+                else:  # Measured inside the render phase's timing
+                    stats.phases['render'] -= measured[phase]
+        if progress is not None:
+            progress(len(kids), label_count)
+    if stats is not None:
+        stats.phases['render'] -= stats.phases['input'] - input_time
+
+    writer.write_obj(resources_num, b'<</Font<</%s %d 0 R/%s %d 0 R>>/XObject<<%s>>>>' % (
+        FONT_REGULAR.encode(), font_regular_num, FONT_BOLD.encode(), font_bold_num,
+        b''.join(b'/%s %d 0 R' % (name.encode(), num) for name, num in xobjects.items())))
+    return kids, label_count
+
+def write_pdf(items: Iterable[dict], fileobj: BinaryIO, compress_level: Optional[int] = None,
+              use_xobjects: bool = False, workers: int = 1,
+              progress: Optional[Callable[[int, int], None]] = None,
+              template: Union[LabelTemplate, str, None] = None, fit_text: bool = False,
+              symbology: str = SYMBOLOGY_CODE39, stats: Optional[RenderStats] = None) -> int:
+    """Stream labels from any iterable of items into a binary file object.
+
+    Each page is rendered and written as soon as it is full, so memory use does not
+    grow with the number of labels. Labels are laid out on sheets by template (a
+    LabelTemplate or the name of one in TEMPLATES; letter-4 by default), whose slot
+    geometry is computed once per run. With fit_text, titles too wide for the label are
+    shrunk and then truncated with an ellipsis. Barcodes are drawn in symbology (code39
+    or code128) unless an item's own 'symbology' field says otherwise. Page content streams are Flate-compressed when
+    compress_level (0-9, as for zlib) is given. With use_xobjects the label frame and
+    each Code 39 character used are defined once as Form XObjects and placed with Do.
+    With workers > 1, page content streams are rendered in a pool of that many processes
+    in chunks of PARALLEL_CHUNK_PAGES pages and written in order; on platforms that spawn
+    processes the caller must be guarded by "if __name__ == '__main__'".
+    progress, if given, is called with (pages written, labels written) after every page;
+    an exception raised from it stops the run. Pass a RenderStats as stats to collect
+    phase timings and counters. Returns the number of labels written.
+    """
+    options = make_render_options(compress_level, use_xobjects, template, fit_text, symbology)
+    pages = iter_pages(items, options.template.labels_per_page)
+    if stats is not None:
+        cache_before = cache_info()
+        pages = stats.timed('input', pages)
+    first_page = next(pages, None)
+    if first_page is None:
+        raise ValueError("No items provided for PDF generation")
+
+    writer = PDFWriter(fileobj)
+    catalog_num = writer.alloc()
+    pages_num = writer.alloc()
+
+    writer.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')  # Binary marker for compressed streams
+    writer.write_obj(catalog_num, b'<</Type/Catalog/Pages %d 0 R>>' % pages_num)
+    kids, label_count = write_pages(writer, chain([first_page], pages), options, pages_num, workers, progress, stats)
+    if stats is not None:
+        xref_start = time.perf_counter()
+    writer.write_obj(pages_num, b'<</Type/Pages/Kids[%s]/Count %d>>' % (
+        b' '.join(b'%d 0 R' % kid for kid in kids), len(kids)))
+    writer.write_trailer(catalog_num)
+    if stats is not None:
+        stats.phases['xref'] += time.perf_counter() - xref_start
+        record_run(stats, cache_before, label_count, len(kids), writer.offset)
+    return label_count
+
+def record_run(stats: RenderStats, cache_before: dict, labels: int, pages: int, size: int):
+    """Add one finished run's counters and cache use to stats."""
+    stats.counts['labels'] += labels
+    stats.counts['pages'] += pages
+    stats.counts['bytes'] += size
+    stats.add_cache_use(cache_before, cache_info())
+
+class PDFSection(NamedTuple):
+    """What an incremental update needs from the newest section of an existing PDF."""
+    end: int  # File length
+    xref_start: int
+    size: int  # Trailer /Size: the next free object number
+    root: int  # Catalog object number
+    pages_num: int  # Root of the page tree
+    pages_body: bytes  # Dictionary of the page tree root, between "obj" and "endobj"
+    page_count: int
+
+def read_xref(fileobj: BinaryIO, xref_start: int, num: Optional[int] = None) -> Tuple[Optional[int], bytes]:
+    """Scan one classic xref section: return (byte offset of object num if listed, trailer line).
+
+    Entries are fixed-width, so subsections are skipped without reading them.
+    """
+    fileobj.seek(xref_start)
+    if fileobj.readline().strip() != b'xref':
+        raise ValueError("Unsupported PDF: no cross-reference table at startxref")
+    offset = None
+    while True:
+        line = fileobj.readline()
+        if line.startswith(b'trailer'):
+            return offset, line
+        try:
+            first, count = map(int, line.split())
+        except ValueError:
+            raise ValueError("Unsupported PDF: malformed cross-reference table")
+        entries_start = fileobj.tell()
+        if num is not None and offset is None and first <= num < first + count:
+            fileobj.seek(entries_start + 20 * (num - first))
+            entry = fileobj.read(20)
+            if entry[17:18] == b'n':
+                offset = int(entry[:10])
+        fileobj.seek(entries_start + 20 * count)
+
+def trailer_value(trailer: bytes, key: bytes) -> Optional[int]:
+    match = re.search(rb'/' + key + rb'\s+(\d+)', trailer)
+    return int(match.group(1)) if match else None
+
+def read_object(fileobj: BinaryIO, xref_start: int, num: int) -> bytes:
+    """Body of the newest version of object num, following the /Prev chain from xref_start."""
+    while True:
+        offset, trailer = read_xref(fileobj, xref_start, num)
+        if offset is not None:
+            break
+        xref_start = trailer_value(trailer, b'Prev')
+        if xref_start is None:
+            raise ValueError(f"Unsupported PDF: object {num} is not in the cross-reference table")
+
+    fileobj.seek(offset)
+    data = b''
+    while b'endobj' not in data:
+        chunk = fileobj.read(65536)
+        if not chunk:
+            raise ValueError(f"Unsupported PDF: object {num} is truncated")
+        data += chunk
+    header = b'%d 0 obj' % num
+    if not data.startswith(header):
+        raise ValueError(f"Unsupported PDF: object {num} is not where the cross-reference table says")
+    return data[len(header):data.index(b'endobj')].strip()
+
+def read_pdf_section(fileobj: BinaryIO) -> PDFSection:
+    """Locate the newest xref, trailer and page tree root of a PDF written by write_pdf or append_pdf."""
+    end = fileobj.seek(0, io.SEEK_END)
+    fileobj.seek(max(0, end - 1024))
+    match = re.search(rb'startxref\s+(\d+)\s+%%EOF\s*$', fileobj.read())
+    if not match:
+        raise ValueError("Not a complete PDF: no startxref at the end of the file")
+    xref_start = int(match.group(1))
+
+    _, trailer = read_xref(fileobj, xref_start)
+    size = trailer_value(trailer, b'Size')
+    root = trailer_value(trailer, b'Root')
+    if size is None or root is None:
+        raise ValueError("Unsupported PDF: trailer has no /Size or /Root")
+    pages_num = trailer_value(read_object(fileobj, xref_start, root), b'Pages')
+    if pages_num is None:
+        raise ValueError("Unsupported PDF: catalog has no /Pages")
+    pages_body = read_object(fileobj, xref_start, pages_num)
+    page_count = trailer_value(pages_body, b'Count')
+    if page_count is None or not pages_body.startswith(b'<<') or b'/Parent' in pages_body:
+        raise ValueError("Unsupported PDF: page tree root is not a plain /Pages dictionary")
+    return PDFSection(end, xref_start, size, root, pages_num, pages_body, page_count)
+
+def append_pdf(items: Iterable[dict], fileobj: BinaryIO, compress_level: Optional[int] = None,
+               use_xobjects: bool = False, workers: int = 1,
+               progress: Optional[Callable[[int, int], None]] = None,
+               template: Union[LabelTemplate, str, None] = None, fit_text: bool = False,
+               symbology: str = SYMBOLOGY_CODE39, stats: Optional[RenderStats] = None) -> int:
+    """Add labels to a PDF made by write_pdf as an incremental update; returns the number of labels added.
+
+    fileobj must be opened for reading and writing ("r+b"). The existing bytes are left as
+    they are: the new pages, their own fonts and resources, a new page tree root whose kids
+    are the previous root and the new pages, the previous root with its /Parent set, a
+    catalog pointing at the new root, and an xref chained to the old one through /Prev are
+    written after them. Only the previous root's dictionary is copied, so the cost depends
+    on the labels added, not on the size of the document (after the first append the
+    previous root holds just one entry per append). If writing fails the file is truncated
+    back to its original length. Options, including stats, are as for write_pdf.
+    """
+    options = make_render_options(compress_level, use_xobjects, template, fit_text, symbology)
+    pages = iter_pages(items, options.template.labels_per_page)
+    if stats is not None:
+        cache_before = cache_info()
+        pages = stats.timed('input', pages)
+    first_page = next(pages, None)
+    if first_page is None:
+        raise ValueError("No items provided for PDF generation")
+
+    section = read_pdf_section(fileobj)
+    fileobj.seek(section.end)
+    writer = PDFWriter(fileobj, section.end, section.size)
+    try:
+        writer.write(b'\n')  # The previous section may not end with an end-of-line
+        root_num = writer.alloc()
+        kids, label_count = write_pages(writer, chain([first_page], pages), options, root_num, workers, progress,
+                                        stats)
+        if stats is not None:
+            xref_start = time.perf_counter()
+        writer.write_obj(section.pages_num, b'<</Parent %d 0 R' % root_num + section.pages_body[2:])
+        writer.write_obj(root_num, b'<</Type/Pages/Kids[%d 0 R %s]/Count %d>>' % (
+            section.pages_num, b' '.join(b'%d 0 R' % kid for kid in kids), section.page_count + len(kids)))
+        writer.write_obj(section.root, b'<</Type/Catalog/Pages %d 0 R>>' % root_num)
+        writer.write_trailer(section.root, section.xref_start)
+    except BaseException:
+        fileobj.seek(section.end)
+        fileobj.truncate()
+        raise
+    if stats is not None:
+        stats.phases['xref'] += time.perf_counter() - xref_start
+        record_run(stats, cache_before, label_count, len(kids), writer.offset - section.end)
+    return label_count
 
-    def get_string_width(s, font_size, font_type):
-        char_width = CHAR_WIDTH_BOLD if font_type == FONT_BOLD else CHAR_WIDTH_REGULAR
-        return len(s) * char_width * font_size
+def create_pdf(items: List[dict], **options) -> bytes:
+    """Create a PDF with improved label formatting, precisely centered content, and cutting guide.
 
+    Accepts the same keyword options as write_pdf.
+    """
     try:
-        # Validate items
-        if not items:
-            raise ValueError("No items provided for PDF generation")
-        
-        for item in items:
-            if not all(key in item for key in ['title1', 'title2', 'barcode']):
-                raise ValueError("Missing required fields in item (title1, title2, or barcode)")
-
-        pdf_content = [
-            '%PDF-1.4',
-            '1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj'
-        ]
-
-        pages = []
-        page_count = (len(items) + 3) // 4  # Calculate total number of pages
-
-        for page in range(page_count):
-            content = ['BT']
-            for i in range(4):
-                item_index = page * 4 + i
-                if item_index >= len(items):
-                    break
-
-                item = items[item_index]
-                y_bottom = 792 - (i * 198 + 180)  # Bottom of the label
-                y_top = y_bottom + LABEL_HEIGHT   # Top of the label
-                
-                # Draw main border
-                content.extend([
-                    '2 w',  # Set line width to 2
-                    '0.8 0.8 0.8 RG',  # Set stroke color to light gray
-                    f'{LABEL_MARGIN_LEFT} {y_bottom+LABEL_MARGIN_BOTTOM} {LABEL_WIDTH} {LABEL_HEIGHT} re S',  # Draw rectangle
-                ])
-                
-                # Draw secondary dashed border for cutting guide
-                content.extend([
-                    '[4 4] 0 d',  # Set dash pattern
-                    '1 w',  # Set line width to 1
-                    '0 0 0 RG',  # Set stroke color to black
-                    f'{LABEL_MARGIN_LEFT-10} {y_bottom-6} {LABEL_WIDTH+20} {LABEL_HEIGHT+20} re S',  # Draw rectangle
-                    '[] 0 d'  # Reset dash pattern
-                ])
-                
-                # Center of the label
-                center_x = LABEL_MARGIN_LEFT + (LABEL_WIDTH / 2)
-                
-                # Title 1 (larger font, centered)
-                title1_width = get_string_width(item["title1"], FONT_SIZE_TITLE1, FONT_BOLD)
-                title1_start = center_x - (title1_width / 2)
-                content.extend([
-                    f'/{FONT_BOLD} {FONT_SIZE_TITLE1} Tf',  # Bold font
-                    '0 0 0 rg',  # Black color
-                    f'1 0 0 1 {title1_start} {y_top-30} Tm',
-                    f'({escape_pdf_string(item["title1"])}) Tj'
-                ])
-                
-                # Title 2 (smaller font, centered)
-                title2_width = get_string_width(item["title2"], FONT_SIZE_TITLE2, FONT_REGULAR)
-                title2_start = center_x - (title2_width / 2)
-                content.extend([
-                    f'/{FONT_REGULAR} {FONT_SIZE_TITLE2} Tf',  # Regular font
-                    f'1 0 0 1 {title2_start} {y_top-55} Tm',
-                    f'({escape_pdf_string(item["title2"])}) Tj'
-                ])
-                
-                # Generate and draw barcode (centered)
-                barcode = generate_code39(item['barcode'])
-                content.append('0 G')  # Set fill color to black
-                barcode_total_width = sum(rect[2] for rect in barcode) * 0.5
-                barcode_start_x = center_x - (barcode_total_width / 2) - 50
-                barcode_start_y = y_bottom + (LABEL_HEIGHT - BARCODE_HEIGHT) / 3  # Bottom third vertically
-                for rect in barcode:
-                    x, _, width, height = rect
-                    content.append(f'{barcode_start_x + x*0.5} {barcode_start_y} {width*0.5} {BARCODE_HEIGHT} re f')
-                
-                # Barcode number (centered)
-                barcode_text = "*" + item["barcode"] + "*"
-                barcode_text_width = get_string_width(barcode_text, FONT_SIZE_BARCODE, FONT_REGULAR)
-                barcode_text_start = center_x - (barcode_text_width / 2)
-                content.extend([
-                    f'/{FONT_REGULAR} {FONT_SIZE_BARCODE} Tf',  # Regular font
-                    f'1 0 0 1 {barcode_text_start} {y_bottom+20} Tm',
-                    f'({escape_pdf_string(barcode_text)}) Tj'
-                ])
-
-            content.append('ET')
-            pages.append('\n'.join(content))
-
-        # Add page objects
-        for i in range(page_count):
-            pdf_content.append(f'{3+i*2} 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 612 792]/Contents {4+i*2} 0 R/Resources<</Font<</F1 {3+page_count*2} 0 R/F2 {4+page_count*2} 0 R>>>>>>endobj')
-            pdf_content.append(f'{4+i*2} 0 obj<</Length {5+i*2} 0 R>>stream\n{pages[i]}\nendstream\nendobj')
-            pdf_content.append(f'{5+i*2} 0 obj\n{len(pages[i])}\nendobj')
-
-        # Add Pages object
-        pdf_content.insert(2, f'2 0 obj<</Type/Pages/Kids[{" ".join([f"{3+i*2} 0 R" for i in range(page_count)])}]/Count {page_count}>>endobj')
-
-        # Add font objects
-        pdf_content.extend([
-            f'{3+page_count*2} 0 obj<</Type/Font/Subtype/Type1/BaseFont/Helvetica>>endobj',
-            f'{4+page_count*2} 0 obj<</Type/Font/Subtype/Type1/BaseFont/Helvetica-Bold>>endobj',
-        ])
-
-        # Create xref
-        xref_start = len('\n'.join(pdf_content)) + 1
-        pdf_content.append('xref')
-        pdf_content.append(f'0 {5+page_count*2}')
-        pdf_content.append('0000000000 65535 f ')
-        
-        offset = 0
-        for i in range(1, 5+page_count*2):
-            offset += len(pdf_content[i-1]) + 1  # +1 for newline
-            pdf_content.append(f'{offset:010} 00000 n ')
-
-        # Trailer
-        pdf_content.extend([
-            f'trailer<</Size {5+page_count*2}/Root 1 0 R>>',
-            'startxref',
-            str(xref_start),
-            '%%EOF'
-        ])
-
-        return '\n'.join(pdf_content).encode()
+        buffer = io.BytesIO()
+        write_pdf(items, buffer, **options)
+        return buffer.getvalue()
 
     except Exception as e:
         raise ValueError(f"Error creating PDF: {str(e)}")
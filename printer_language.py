@@ -0,0 +1,159 @@
+import io
+from typing import BinaryIO, Iterable, List, Tuple
+
+import pdf_generator
+from pdf_generator import BARCODE_HEIGHT, LABEL_HEIGHT, LABEL_WIDTH, SYMBOLOGY_CODE39
+
+# Supported printer command languages
+LANGUAGE_ZPL = 'zpl'
+LANGUAGE_EPL = 'epl'
+
+DEFAULT_DPI = 203
+
+# Cap height of Helvetica in 1/1000 em, used to turn PDF baselines into top-left text origins
+CAP_HEIGHT = 718
+
+# Resident EPL fonts 1-5 as (cell width, cell height) in dots, including inter-character spacing
+EPL_FONTS = {
+    203: {1: (10, 12), 2: (12, 16), 3: (14, 20), 4: (16, 24), 5: (34, 48)},
+    300: {1: (14, 20), 2: (18, 28), 3: (22, 36), 4: (26, 44), 5: (50, 80)},
+}
+EPL_MAX_MULTIPLIER = 6
+
+# Wide to narrow bar ratio of the native Code 39 barcodes (^BY ratio, EPL wide bar width)
+CODE39_WIDE_RATIO = 3
+
+# ZPL field data escapes: with ^FH, _ introduces a hex byte, so ^ ~ and _ itself are hex encoded
+ZPL_ESCAPES = {ord(char): '_%02X' % ord(char) for char in '^~_'}
+
+def label_text(item: dict, fit_text: bool = False,
+               symbology: str = SYMBOLOGY_CODE39) -> List[Tuple[str, float, float]]:
+    """The three text lines of a label as (text, font size, top edge in points), matching the PDF layout."""
+    return [(line.text, line.size, LABEL_HEIGHT - line.y - line.size * CAP_HEIGHT / 1000)
+            for line in pdf_generator.layout_label_text(item, fit_text, symbology)]
+
+def barcode_top() -> float:
+    """Top edge of the barcode in points from the top of the label, as create_pdf places it."""
+    _, y = pdf_generator.barcode_origin(0)
+    return LABEL_HEIGHT - y - BARCODE_HEIGHT
+
+def narrow_bar_dots(dpi: int) -> int:
+    """Narrow bar width in printer dots, as close to the PDF's as the printer resolution allows."""
+    return max(1, round(pdf_generator.BAR_WIDTH_NARROW * 0.5 * dpi / 72))
+
+def native_barcode_width(data: str, symbology: str, narrow: int) -> int:
+    """Width in dots of the printer's own barcode for data, with narrow-dot modules.
+
+    A Code 39 character is 3 wide and 6 narrow elements plus a narrow gap, for the data
+    and its start and stop characters; Code 128 is 11 modules per symbol plus 2 more for
+    the stop pattern.
+    """
+    if symbology == SYMBOLOGY_CODE39:
+        characters = len(pdf_generator.preprocess_code39(data)) + 2
+        return characters * (3 * CODE39_WIDE_RATIO * narrow + 6 * narrow + narrow)
+    symbols = len(pdf_generator.code128_values(pdf_generator.preprocess_code128(data)))
+    return (11 * symbols + 2) * narrow
+
+def barcode_left(data: str, symbology: str, width: int, narrow: int) -> int:
+    """Left edge in dots that centres the native barcode on a label width dots wide, never below 0."""
+    return max(0, (width - native_barcode_width(data, symbology, narrow)) // 2)
+
+def zpl_field(text: str) -> str:
+    """^FD data in code page 1252, with the ZPL command prefixes hex-escaped."""
+    return text.encode('cp1252', 'replace').decode('latin-1').translate(ZPL_ESCAPES)
+
+def render_zpl_label(item: dict, dpi: int = DEFAULT_DPI, fit_text: bool = False,
+                     symbology: str = SYMBOLOGY_CODE39) -> str:
+    """One ^XA...^XZ label format with centred text fields and a native ^B3 Code 39 or ^BC Code 128 barcode."""
+    scale = dpi / 72
+    width = round(LABEL_WIDTH * scale)
+    lines = ['^XA', '^CI27', f'^PW{width}', f'^LL{round(LABEL_HEIGHT * scale)}']
+    for text, size, top in label_text(item, fit_text, symbology):  # Font 0, the scalable sans serif
+        height = round(size * scale)
+        lines.append(f'^FO0,{round(top * scale)}^A0N,{height},{height}^FB{width},1,0,C,0'
+                     f'^FH^FD{zpl_field(text)}^FS')
+
+    narrow = narrow_bar_dots(dpi)
+    height = round(BARCODE_HEIGHT * scale)
+    origin = (f'^FO{barcode_left(item["barcode"], symbology, width, narrow)},{round(barcode_top() * scale)}'
+              f'^BY{narrow},{CODE39_WIDE_RATIO:.1f},{height}')
+    if symbology == SYMBOLOGY_CODE39:
+        symbols = pdf_generator.preprocess_code39(item['barcode'])
+        lines.append(f'{origin}^B3N,N,{height},N,N^FD{symbols}^FS')
+    else:  # Code 128 in automatic subset mode
+        data = pdf_generator.preprocess_code128(item['barcode'])
+        lines.append(f'{origin}^BCN,{height},N,N,N,A^FH^FD{zpl_field(data)}^FS')
+    lines.append('^XZ')
+    return '\n'.join(lines) + '\n'
+
+def epl_font(size: float, dpi: int) -> Tuple[int, int, int]:
+    """Pick the resident font and multiplier whose height is closest to size points: (font, multiplier, cell width)."""
+    target = size * dpi / 72
+    font, multiplier = min(((font, multiplier) for font in EPL_FONTS[dpi]
+                            for multiplier in range(1, EPL_MAX_MULTIPLIER + 1)),
+                           key=lambda choice: abs(EPL_FONTS[dpi][choice[0]][1] * choice[1] - target))
+    return font, multiplier, EPL_FONTS[dpi][font][0] * multiplier
+
+def epl_string(text: str) -> str:
+    """Quoted EPL string data in code page 1252."""
+    text = text.encode('cp1252', 'replace').decode('latin-1')
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def render_epl_label(item: dict, dpi: int = DEFAULT_DPI, fit_text: bool = False,
+                     symbology: str = SYMBOLOGY_CODE39) -> str:
+    """One EPL2 label: fixed-pitch text centred by cell width, and a native Code 39 (B...3) or Code 128 (B...1) barcode."""
+    scale = dpi / 72
+    width = round(LABEL_WIDTH * scale)
+    lines = ['I8,A,001',  # 8-bit text in code page 1252, matching epl_string
+             'N', f'q{width}', f'Q{round(LABEL_HEIGHT * scale)},24']
+    for text, size, top in label_text(item, fit_text, symbology):
+        font, multiplier, cell_width = epl_font(size, dpi)
+        x = max(0, (width - len(text) * cell_width) // 2)
+        lines.append(f'A{x},{round(top * scale)},0,{font},{multiplier},{multiplier},N,{epl_string(text)}')
+
+    narrow = narrow_bar_dots(dpi)
+    if symbology == SYMBOLOGY_CODE39:
+        kind, wide, data = 3, narrow * CODE39_WIDE_RATIO, pdf_generator.preprocess_code39(item['barcode'])
+    else:  # Code 128 with automatic subset switching; the wide bar setting is unused
+        kind, wide, data = 1, narrow, pdf_generator.preprocess_code128(item['barcode'])
+    x = barcode_left(item['barcode'], symbology, width, narrow)
+    lines.append(f'B{x},{round(barcode_top() * scale)},0,{kind},{narrow},{wide},'
+                 f'{round(BARCODE_HEIGHT * scale)},N,{epl_string(data)}')
+    lines.append('P1')
+    return '\n'.join(lines) + '\n'
+
+RENDERERS = {LANGUAGE_ZPL: render_zpl_label, LANGUAGE_EPL: render_epl_label}
+
+def write_labels(items: Iterable[dict], fileobj: BinaryIO, language: str = LANGUAGE_ZPL,
+                 dpi: int = DEFAULT_DPI, fit_text: bool = False, symbology: str = SYMBOLOGY_CODE39) -> int:
+    """Stream items as a ZPL or EPL print job, one label format per item; returns the number of labels.
+
+    The layout follows the PDF: same title positions and sizes, and the barcode from the
+    printer's own Code 39 or Code 128 command (symbology, or an item's 'symbology' field)
+    with the narrow bar width and height create_pdf uses, centred across the label.
+    The output is deterministic, so it can be compared against golden files.
+    """
+    if language not in RENDERERS:
+        raise ValueError(f"Unsupported printer language: {language}")
+    if dpi <= 0:
+        raise ValueError("Printer resolution must be a positive number of dots per inch")
+    if language == LANGUAGE_EPL and dpi not in EPL_FONTS:
+        raise ValueError(f"EPL output supports {' or '.join(map(str, EPL_FONTS))} dpi printers")
+    pdf_generator.validate_symbology(symbology)
+    render = RENDERERS[language]
+
+    count = 0
+    for item in items:
+        pdf_generator.validate_item(item)
+        item_symbology = pdf_generator.item_symbology(item, symbology)
+        fileobj.write(render(item, dpi, fit_text, item_symbology).encode('latin-1'))
+        count += 1
+    if not count:
+        raise ValueError("No items provided for label generation")
+    return count
+
+def create_labels(items: List[dict], **options) -> bytes:
+    """Build a whole print job in memory; accepts the same keyword options as write_labels."""
+    buffer = io.BytesIO()
+    write_labels(items, buffer, **options)
+    return buffer.getvalue()
@@ -12,6 +12,9 @@ PyInstaller.__main__.run([
     '--name=Label Generator',  # name of your executable
     '--icon=icon.ico',  # path to your icon file
     '--add-data=pdf_generator.py;.',  # include additional Python modules
+    '--add-data=item_reader.py;.',
+    '--hidden-import=concurrent.futures',  # imported by the modules above, which are loaded at runtime
+    '--hidden-import=csv',
     # '--noconsole',  # hide the console window
     '--clean',  # clean PyInstaller cache
     '--noconfirm',  # replace output directory without asking
@@ -0,0 +1,34 @@
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import item_reader
+import pdf_generator
+
+class MapRecordTest(unittest.TestCase):
+    """Bad rows are rejected while reading, with the line they came from."""
+
+    def read(self, text):
+        return list(item_reader.read_items(io.StringIO(text)))
+
+    def test_symbologies_match_engine(self):
+        self.assertEqual(item_reader.SYMBOLOGIES, pdf_generator.SYMBOLOGIES)
+
+    def test_empty_barcode(self):
+        with self.assertRaisesRegex(ValueError, r'^Line 3: empty barcode'):
+            self.read('title1,title2,barcode\nA,B,1\nA,B, \n')
+
+    def test_unknown_symbology(self):
+        with self.assertRaisesRegex(ValueError, r"^Line 2: unknown barcode symbology 'qr'"):
+            self.read('title1,title2,barcode,symbology\nA,B,1,qr\n')
+
+    def test_valid_rows(self):
+        items = self.read('title1,title2,barcode,symbology\nA,B,1,code128\nC,D,2,\n')
+        self.assertEqual(items, [{'title1': 'A', 'title2': 'B', 'barcode': '1', 'symbology': 'code128'},
+                                 {'title1': 'C', 'title2': 'D', 'barcode': '2'}])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import label_server
+
+ITEM = {'title1': 'Bolts M8', 'title2': 'Bin 7', 'barcode': 'AB123'}
+
+class ParseJobTest(unittest.TestCase):
+    """Wrongly typed fields and options are refused up front, so the client gets a 400."""
+
+    def parse(self, payload):
+        return label_server.parse_job(json.dumps(payload).encode())
+
+    def test_valid_options(self):
+        options = {'template': 'a4-8', 'fit_text': True, 'use_xobjects': False,
+                   'compress_level': 6, 'symbology': 'code128'}
+        self.assertEqual(self.parse(dict(options, items=[ITEM])), ([ITEM], options))
+
+    def test_bad_item_fields(self):
+        for field, value in [('title1', 12), ('title2', None), ('barcode', ['AB']), ('symbology', 128)]:
+            with self.subTest(field=field), self.assertRaisesRegex(ValueError, f"'{field}' must be a string"):
+                self.parse([dict(ITEM, **{field: value})])
+
+    def test_bad_options(self):
+        for name, value in [('template', 5), ('symbology', True), ('fit_text', 1), ('use_xobjects', 'yes'),
+                            ('compress_level', True), ('compress_level', 6.0), ('compress_level', 10)]:
+            with self.subTest(name=name, value=value), self.assertRaisesRegex(ValueError, f"'{name}' must be"):
+                self.parse({'items': [ITEM], name: value})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import sys
+import unittest
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdf_generator
+
+class SheetGeometryTest(unittest.TestCase):
+    """Scaled labels stay inside their slots and warn when bars get too thin to scan."""
+
+    def test_sticker_slots_are_clipped(self):
+        for name, template in pdf_generator.TEMPLATES.items():
+            with self.subTest(template=name):
+                placement = pdf_generator.sheet_geometry(template).placements[0]
+                self.assertEqual(placement.endswith(' re W n'), not template.cutting_guide)
+
+    def test_thin_bars_warn(self):
+        for name, expected in [('letter-4', False), ('avery-5163', False), ('avery-5160', True), ('a4-21', True)]:
+            with self.subTest(template=name), warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                pdf_generator.make_render_options(template=name)
+                self.assertEqual(bool(caught), expected)
+                self.assertEqual(pdf_generator.template_warning(name) is not None, expected)
+
+class RenderStatsTest(unittest.TestCase):
+    """Counting rectangles must agree across modes and must not touch the caches."""
+
+    def test_rects_and_cache_use(self):
+        items = [{'title1': f'Part {i}', 'title2': 'Bin', 'barcode': f'AB{i}'} for i in range(40)]
+        rects = set()
+        for use_xobjects in (False, True):
+            with self.subTest(use_xobjects=use_xobjects):
+                pdf_generator.LABEL_CACHE.clear()
+                stats = pdf_generator.RenderStats()
+                pdf_generator.create_pdf(items, use_xobjects=use_xobjects, stats=stats)
+                self.assertEqual(stats.as_dict()['cache']['label'], {'hits': 0, 'misses': 40, 'hit_rate': 0.0})
+                rects.add(stats.counts['rects'])
+        self.assertEqual(len(rects), 1)
+
+    def test_encode_and_layout_phases(self):
+        pdf_generator.LABEL_CACHE.clear()
+        pdf_generator.BARCODE_CACHE.clear()
+        stats = pdf_generator.RenderStats()
+        pdf_generator.create_pdf([{'title1': 'Part', 'title2': 'Bin', 'barcode': 'AB1'}], stats=stats)
+        self.assertGreater(stats.phases['encode'], 0)
+        self.assertGreater(stats.phases['layout'], 0)
+        self.assertAlmostEqual(stats.total(), sum(stats.phases.values()))
+        self.assertIsNone(pdf_generator.PROFILE)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import printer_language
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden')
+
+# A non-ASCII title and location, a Code 128 item next to the default Code 39 one, and a long barcode
+ITEMS = [
+    {'title1': 'Café Crème Ø40', 'title2': 'Aisle 4 °C – €12', 'barcode': 'PART-0042'},
+    {'title1': 'Bolts M8', 'title2': 'Bin 7', 'barcode': 'AB123456cd', 'symbology': 'code128'},
+    {'title1': 'Gasket', 'title2': 'Shelf 2', 'barcode': 'PN-1234567890ABC'},
+]
+
+class GoldenJobTest(unittest.TestCase):
+    """Print jobs must match the checked-in golden files byte for byte.
+
+    After an intended change, regenerate them with UPDATE_GOLDEN=1 and review the diff.
+    """
+
+    def check_golden(self, name, language):
+        job = printer_language.create_labels(ITEMS, language=language)
+        path = os.path.join(GOLDEN_DIR, name)
+        if os.environ.get('UPDATE_GOLDEN'):
+            with open(path, 'wb') as f:
+                f.write(job)
+        with open(path, 'rb') as f:
+            self.assertEqual(job, f.read())
+
+    def test_zpl(self):
+        self.check_golden('labels.zpl', printer_language.LANGUAGE_ZPL)
+
+    def test_epl(self):
+        self.check_golden('labels.epl', printer_language.LANGUAGE_EPL)
+
+if __name__ == '__main__':
+    unittest.main()